@@ -0,0 +1,299 @@
+"""Load test for the read endpoints: server lists and /stats, served by uvicorn over local HTTP.
+
+The app runs in a child process with lifespan events off: its SQLite database is
+seeded with a year of stats samples per source (rolled up and compacted the way
+startup does it) and its caches with one refresh of every source against the
+fakes in fakes.py. This process then drives each endpoint with concurrent
+keep-alive clients for a fixed duration and records latency percentiles and
+throughput.
+
+Scenarios: "idle" serves the seeded caches; "refresh" keeps every source
+refreshing against the fakes in the background, so snapshot encoding, polling
+and database writes compete with the requests.
+
+    python benchmarks/bench_api.py --servers 2000 --concurrency 32 --duration 5 --output before.json
+    python benchmarks/bench_api.py --servers 2000 --concurrency 32 --duration 5 --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from fakes import FakeCartographer, FakeElDewrito, FakeGameSpyMaster, FakeUDPResponders, FakeUnavailable, FaultProfile
+from gamespy_payloads import server
+
+SCENARIOS = ("idle", "refresh")
+
+
+def stats_fixture(days: int, seed: int) -> List[tuple]:
+    """(player_count, server_count, recorded_at) samples every STATS_INTERVAL with a daily cycle."""
+    import math
+    import random
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=days)
+    rows = []
+    for i in range(days * 86400 // server.STATS_INTERVAL):
+        at = start + timedelta(seconds=i * server.STATS_INTERVAL)
+        daily = 0.5 + 0.5 * math.sin(2 * math.pi * (at.hour * 60 + at.minute) / 1440)
+        players = int(400 * daily + rng.randint(0, 60))
+        rows.append((players, 80 + players // 6 + rng.randint(0, 10), at))
+    return rows
+
+
+async def seed_database(days: int, seed: int):
+    await server.init_db()
+    rows = stats_fixture(days, seed)
+
+    def insert(conn, table: str):
+        conn.executemany(f"INSERT INTO {table} (player_count, server_count, recorded_at) VALUES (?, ?, ?)", rows)
+        server.rebuild_stats_rollups(conn, table)
+
+    for source in server.sources.values():
+        await server.db.write(insert, source.stats_table)
+        await server.load_stats_series(source.stats_table, source.label)
+
+
+async def install_fakes(count: int, tmp: str, faults: FaultProfile) -> list:
+    """Point every source at a fake upstream with count servers; returns cleanup callables."""
+    server.http_clients["eldewrito_api"] = FakeUnavailable().client()
+
+    eldewrito = FakeElDewrito(count, faults=faults)
+    eldewrito.write_master_list(os.path.join(tmp, "dewrito.json"))
+    server.ELDEWRITO_MASTER_LIST = os.path.join(tmp, "dewrito.json")
+    server.http_clients["eldewrito"] = eldewrito.client(limits=server.HTTP_UPSTREAMS["eldewrito"].limits)
+    for ip_port in eldewrito.servers:
+        ip = ip_port.split(":")[0]
+        server.rdns_cache.set(ip, f"{ip}.bench.invalid", server.RDNS_TTL)
+
+    cartographer = FakeCartographer(count, faults=faults)
+    server.http_clients["cartographer"] = cartographer.client(limits=server.HTTP_UPSTREAMS["cartographer"].limits)
+
+    closers = []
+    for name in ("haloce", "halopc"):
+        responders = FakeUDPResponders(count, faults=faults)
+        master = FakeGameSpyMaster(await responders.start(), faults=faults)
+        source = server.sources[name]
+        source.master_host, source.master_port = "127.0.0.1", await master.start()
+        closers += [responders.close, master.close]
+    return closers
+
+
+async def keep_refreshing(pause: float):
+    while True:
+        for source in server.sources.values():
+            # A fresh registry makes every server due, so each cycle polls all of them
+            server.server_registry = server.ServerRegistry()
+            await source.run_refresh()
+            await source.record_stats()
+        await asyncio.sleep(pause)
+
+
+async def serve(args: argparse.Namespace):
+    import uvicorn
+
+    tmp = tempfile.mkdtemp(prefix="bench-api-")
+    server.db = server.Database(os.path.join(tmp, "database.sqlite"))
+    faults = FaultProfile(latency=args.latency, jitter=args.latency, seed=args.seed)
+    closers = await install_fakes(args.servers, tmp, faults)
+    await seed_database(args.days, args.seed)
+    for source in server.sources.values():
+        await source.run_refresh()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, lifespan="off", log_level="warning", access_log=False))
+    serving = asyncio.create_task(uvicorn_server.serve(sockets=[sock]))
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.05)
+
+    refreshing = asyncio.create_task(keep_refreshing(args.refresh_pause)) if args.scenario == "refresh" else None
+    print(json.dumps({
+        "port": sock.getsockname()[1],
+        "tmp": tmp,
+        "listed": {name: len(source.cache.get("servers") or []) for name, source in server.sources.items()},
+        "stats_rows": {name: len(server.stats_series[source.stats_table]) for name, source in server.sources.items()},
+    }), flush=True)
+
+    try:
+        await serving
+    finally:
+        if refreshing:
+            refreshing.cancel()
+        for close in closers:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+        server.db.close()
+
+
+def endpoints() -> List[str]:
+    week_ago = int((time.time() - 7 * 86400) * 1000)
+    paths = []
+    for source in server.sources.values():
+        paths.append(source.list_path or source.route_prefix)
+    for source in server.sources.values():
+        paths.append(f"{source.route_prefix}/stats")
+        paths.append(f"{source.route_prefix}/stats?from={week_ago}&points=500")
+    return paths
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+async def drive(base: str, path: str, concurrency: int, duration: float, warmup: float, encoding: str) -> Dict[str, Any]:
+    """Request path from concurrency keep-alive clients; bodies are read raw, without decompressing."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    received = 0
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30.0, headers={"Accept-Encoding": encoding}) as client:
+        async def worker(until: float, record: bool):
+            nonlocal received, errors
+            while time.perf_counter() < until:
+                started = time.perf_counter()
+                try:
+                    async with client.stream("GET", path) as response:
+                        size = 0
+                        async for chunk in response.aiter_raw():
+                            size += len(chunk)
+                except httpx.HTTPError:
+                    errors += record
+                    continue
+                if record:
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    received += size
+
+        if warmup:
+            until = time.perf_counter() + warmup
+            await asyncio.gather(*(worker(until, False) for _ in range(concurrency)))
+        started = time.perf_counter()
+        until = started + duration
+        await asyncio.gather(*(worker(until, True) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": path.split("?from=")[0] + ("?from=<7d>&points=500" if "?from=" in path else ""),
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "mean_bytes": round(received / len(latencies)) if latencies else 0,
+    }
+
+
+def start_app(scenario: str, args: argparse.Namespace) -> tuple:
+    command = [sys.executable, __file__, "--serve", scenario, "--servers", str(args.servers), "--days", str(args.days),
+               "--latency", str(args.latency), "--refresh-pause", str(args.refresh_pause), "--seed", str(args.seed)]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        proc.wait()
+        raise SystemExit(f"the {scenario} app failed to start")
+    return proc, json.loads(line)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]):
+    before = {(r["scenario"], r["endpoint"]): r for r in baseline["results"]}
+    print(f"{'scenario':<8} {'endpoint':<46} {'p50':>8} {'p99':>8} {'rps':>8}   (current / baseline)")
+    for r in report["results"]:
+        b = before.get((r["scenario"], r["endpoint"]))
+        if b is None:
+            continue
+        ratio = lambda key: f"{r[key] / b[key]:.2f}x" if b[key] else "-"
+        print(f"{r['scenario']:<8} {r['endpoint']:<46} {ratio('p50_ms'):>8} {ratio('p99_ms'):>8} {ratio('rps'):>8}")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--servers", type=int, default=2000, help="servers listed by each fake upstream")
+    parser.add_argument("--days", type=int, default=365, help="days of stats samples in the fixture")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent keep-alive clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="measured seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds per endpoint")
+    parser.add_argument("--encoding", default="gzip", help="Accept-Encoding sent with every request")
+    parser.add_argument("--latency", type=float, default=0.005, help="fake upstream latency while refreshing")
+    parser.add_argument("--refresh-pause", type=float, default=1.0, help="seconds between background refresh rounds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="compare against a report written earlier with --output")
+    parser.add_argument("--json", action="store_true", help="print the JSON report")
+    parser.add_argument("--serve", choices=SCENARIOS, dest="scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.getLogger(server.__name__).setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.scenario:
+        asyncio.run(serve(args))
+        return
+
+    report = {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": {key: getattr(args, key) for key in ("servers", "days", "concurrency", "duration", "warmup", "encoding", "latency", "refresh_pause", "seed")},
+        "fixture": {},
+        "results": [],
+    }
+    for scenario in args.scenarios:
+        proc, ready = start_app(scenario, args)
+        report["fixture"][scenario] = {"listed": ready["listed"], "stats_rows": ready["stats_rows"]}
+        try:
+            base = f"http://127.0.0.1:{ready['port']}"
+            for path in endpoints():
+                result = asyncio.run(drive(base, path, args.concurrency, args.duration, args.warmup, args.encoding))
+                result = {"scenario": scenario, **result}
+                report["results"].append(result)
+                if not args.json:
+                    print(f"{scenario:<8} {result['endpoint']:<46} p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+                          f"{result['rps']:>8.1f} req/s  {result['mean_bytes']:>8} B  errors {result['errors']}")
+        finally:
+            proc.terminate()
+            proc.wait()
+            # uvicorn re-raises SIGTERM once it has shut down, so the child cannot clean up after itself
+            shutil.rmtree(ready["tmp"], ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Micro-benchmark for the GameSpy status response parser.
+
+Parses synthetic status responses with both the reference per-character
+implementation (kept below) and server._parse_gamespy_server_info, checks the
+output matches for every key apart from the added 'players' list, and reports
+responses parsed per second. Fuzzed strings with color codes, control characters
+and non-ASCII text are checked through _clean_gamespy_string as well.
+
+    python benchmarks/bench_gamespy_parse.py --responses 5000 --rounds 5
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from fakes import gamespy_status
+from gamespy_payloads import server
+
+
+def reference_clean(s: str) -> str:
+    result, i = [], 0
+    while i < len(s):
+        c = s[i]
+        if ord(c) < 32 and c not in '\t\n\r': i += 1; continue
+        if c == '^' and i + 1 < len(s) and (s[i+1].isdigit() or s[i+1].islower()): i += 2; continue
+        if c == '\\': result.append('/'); i += 1; continue
+        if 32 <= ord(c) < 127 or ord(c) >= 128: result.append(c)
+        i += 1
+    return ''.join(result)
+
+
+def reference_parse(response_str: str) -> dict:
+    parts = response_str.split('\\')
+    if parts and parts[0] == '': parts = parts[1:]
+    info = {}
+    for i in range(0, len(parts) - 1, 2):
+        key, value = parts[i], reference_clean(parts[i+1])
+        if value.isdigit(): value = int(value)
+        elif re.match(r'^\d+\.\d+$', value): value = float(value)
+        info[key] = value
+    return info
+
+
+def fuzz_strings(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    alphabet = 'aZ09^^^ \t\n\r\x01\x1f\x7f\x80\\/.éß²٣ⅷ\U0001d41a'
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 24))) for _ in range(count)]
+
+
+def check(responses: list, seed: int):
+    for s in fuzz_strings(20000, seed):
+        if server._clean_gamespy_string(s) != reference_clean(s):
+            raise SystemExit(f"_clean_gamespy_string({s!r}) differs from the reference implementation")
+    for response in responses:
+        expected = reference_parse(response)
+        actual = server._parse_gamespy_server_info(response)
+        players = actual.pop('players', None)
+        if actual != expected:
+            raise SystemExit(f"_parse_gamespy_server_info differs from the reference implementation for {response!r}")
+        if expected.get('numplayers') and len(players or ()) != expected['numplayers']:
+            raise SystemExit(f"expected {expected['numplayers']} folded players, got {players!r}")
+
+
+def measure(parse, responses: list, rounds: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for response in responses:
+            parse(response)
+        best = min(best, time.perf_counter() - start)
+    return len(responses) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--responses', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print a machine-readable result')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    responses = [gamespy_status(i, rng).decode('utf-8', errors='ignore') for i in range(args.responses)]
+    check(responses, args.seed)
+
+    result = {
+        'responses': args.responses,
+        'mean_bytes': sum(map(len, responses)) // len(responses),
+        'reference_per_s': measure(reference_parse, responses, args.rounds),
+        'optimized_per_s': measure(server._parse_gamespy_server_info, responses, args.rounds),
+    }
+    result['speedup'] = result['optimized_per_s'] / result['reference_per_s']
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"responses: {args.responses} ({result['mean_bytes']} bytes on average)")
+        print(f"reference: {result['reference_per_s']:.0f} responses/s")
+        print(f"optimized: {result['optimized_per_s']:.0f} responses/s ({result['speedup']:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Refresh-cycle benchmark against the in-process fakes in fakes.py.
+
+Runs each source's refresh for a number of cycles at each scale and reports wall
+time and CPU time per cycle, peak RSS and the per-phase timings from the
+refresh_phase_seconds histogram. Every (source, scale) pair runs in its own
+subprocess so peak RSS is not shared between them. No network access is needed:
+reverse DNS is served from a pre-seeded cache.
+
+The fakes run in the same process, so CPU time includes the work of answering
+the poller; compare runs made with the same fault settings. By default every
+cycle polls every server: the registry is reset between cycles, so later cycles
+measure warm connections and caches rather than the polling schedule. Pass
+--realtime to keep the registry and wait REFRESH_INTERVAL between cycles instead.
+
+    python benchmarks/bench_refresh.py --scales 100 1000 10000 --latency 0.02 --loss 0.01 --timeout 0.02
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from fakes import (FakeCartographer, FakeElDewrito, FakeGameSpyMaster, FakeUDPResponders, FakeUnavailable,
+                   FaultProfile)
+from gamespy_payloads import server
+
+SOURCES = ("eldewrito", "cartographer", "haloce", "halopc")
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def phase_totals(source: str) -> Dict[str, Dict[str, float]]:
+    phases: Dict[str, Dict[str, float]] = {}
+    for (name, phase, _host), state in server.refresh_phase_seconds.values.items():
+        if name != source:
+            continue
+        totals = phases.setdefault(phase, {"count": 0, "seconds": 0.0})
+        totals["count"] += sum(state[:-1])
+        totals["seconds"] += state[-1]
+    return phases
+
+
+async def run_source(name: str, count: int, cycles: int, faults: FaultProfile, summarized: bool,
+                     realtime: bool) -> Dict[str, Any]:
+    tmp = tempfile.mkdtemp(prefix="bench-refresh-")
+    server.db = server.Database(os.path.join(tmp, "database.sqlite"))
+    server.server_registry = server.ServerRegistry()
+    server.http_clients["eldewrito_api"] = FakeUnavailable().client()
+    closers = []
+
+    source = type(server.sources[name])()
+    if name == "eldewrito":
+        fake = FakeElDewrito(count, faults=faults)
+        fake.write_master_list(os.path.join(tmp, "dewrito.json"))
+        server.ELDEWRITO_MASTER_LIST = os.path.join(tmp, "dewrito.json")
+        server.http_clients["eldewrito"] = fake.client(limits=server.HTTP_UPSTREAMS["eldewrito"].limits)
+        for ip_port in fake.servers:
+            server.rdns_cache.set(ip_port.split(":")[0], f"{ip_port.split(':')[0]}.bench.invalid", server.RDNS_TTL)
+    elif name == "cartographer":
+        fake = FakeCartographer(count, summarized=summarized, faults=faults)
+        server.http_clients["cartographer"] = fake.client(limits=server.HTTP_UPSTREAMS["cartographer"].limits)
+    else:
+        responders = FakeUDPResponders(count, faults=faults)
+        addresses = await responders.start()
+        closers.append(responders.close)
+        master = FakeGameSpyMaster(addresses, faults=FaultProfile(latency=faults.latency, seed=faults.seed))
+        source.master_port = await master.start()
+        source.master_host = "127.0.0.1"
+        closers.append(master.close)
+
+    await server.init_db()
+    rss_baseline = current_rss_mb()
+    results: List[Dict[str, Any]] = []
+    for cycle in range(cycles):
+        if not realtime:
+            # Back-to-back cycles would find nothing due; a fresh registry makes every server due again
+            server.server_registry = server.ServerRegistry()
+        wall, cpu = time.perf_counter(), time.process_time()
+        await source.run_refresh()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        results.append({"cycle": cycle, "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+                        "listed": len(source.cache.get("servers") or []),
+                        "players": (source.cache.get("count") or {}).get("players", 0)})
+        await asyncio.sleep(max(0.0, server.REFRESH_INTERVAL - wall) if realtime else 0)
+
+    for close in closers:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+    server.db.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "source": name,
+        "servers": count,
+        "faults": vars(faults),
+        "cycles": results,
+        "rss_baseline_mb": round(rss_baseline, 1),
+        "rss_peak_mb": round(peak_rss_mb(), 1),
+        "phases": phase_totals(name),
+    }
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=list(SOURCES))
+    parser.add_argument("--scales", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--cycles", type=int, default=3, help="refresh cycles per run; the first one is cold")
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds before each fake reply")
+    parser.add_argument("--jitter", type=float, default=0.01, help="extra random latency, seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="chance of dropping a reply")
+    parser.add_argument("--timeout", type=float, default=0.0, help="share of servers that never answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--summarized", action="store_true", help="inline Cartographer details in the list")
+    parser.add_argument("--realtime", action="store_true", help="wait REFRESH_INTERVAL between cycles, so per-server polling schedules apply")
+    parser.add_argument("--json", action="store_true", help="print one JSON document with every run")
+    parser.add_argument("--child", nargs=2, metavar=("SOURCE", "SERVERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    faults = FaultProfile(latency=args.latency, jitter=args.jitter, loss=args.loss, timeout=args.timeout, seed=args.seed)
+
+    if args.child:
+        raise_fd_limit()
+        logging.getLogger(server.__name__).setLevel(logging.WARNING)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        result = asyncio.run(run_source(args.child[0], int(args.child[1]), args.cycles, faults, args.summarized,
+                                        args.realtime))
+        print(json.dumps(result))
+        return
+
+    runs = []
+    passthrough = [arg for arg in sys.argv[1:] if arg != "--json"]
+    for name in args.sources:
+        for count in args.scales:
+            proc = subprocess.run([sys.executable, __file__, *passthrough, "--child", name, str(count)],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                raise SystemExit(f"{name} at {count} servers failed")
+            run = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(run)
+            if not args.json:
+                walls = ", ".join(f"{c['wall_s']:.3f}" for c in run["cycles"])
+                cpus = ", ".join(f"{c['cpu_s']:.3f}" for c in run["cycles"])
+                print(f"{name:>12} {count:>6} servers  listed {run['cycles'][-1]['listed']:>6}  "
+                      f"wall [{walls}] s  cpu [{cpus}] s  rss {run['rss_baseline_mb']:.0f} -> {run['rss_peak_mb']:.0f} MB")
+
+    if args.json:
+        print(json.dumps({"python": sys.version.split()[0], "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
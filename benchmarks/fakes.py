@@ -0,0 +1,276 @@
+"""In-process stand-ins for the upstreams polled by server.py.
+
+- FakeGameSpyMaster: a TCP master that reads the _encode_master_server_request
+  handshake and answers with an enctypex-encrypted list for the requested game
+- FakeUDPResponders: one UDP socket per game server answering status queries
+- FakeElDewrito: master lists, per-server status and /mods over an httpx.MockTransport
+- FakeCartographer: server_list.php and servers/{id} over an httpx.MockTransport
+
+Every fake takes a FaultProfile controlling latency, dropped replies and dead servers.
+"""
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from gamespy_payloads import master_list_payload, server
+
+GAMESPY_MAPS = ("bloodgulch", "dangercanyon", "sidewinder", "deathisland", "icefields", "hangemhigh", "chillout")
+GAMESPY_GAMETYPES = ("CTF", "Slayer", "King", "Oddball", "Race")
+ELDEWRITO_MAPS = (("Guardian", "guardian"), ("Valhalla", "riverworld"), ("Narrows", "chill"), ("The Pit", "cyberdyne"))
+ELDEWRITO_VARIANTS = (("Slayer", "slayer"), ("Team Slayer", "slayer"), ("CTF", "ctf"), ("Oddball", "oddball"))
+
+
+@dataclass
+class FaultProfile:
+    """How a fake misbehaves.
+
+    latency/jitter: seconds before each reply (jitter is added uniformly at random)
+    loss:           chance that any single reply is dropped
+    timeout:        share of servers that are dead and never answer; HTTP requests to them
+                    hang until the client's own timeout, like an unreachable host
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    loss: float = 0.0
+    timeout: float = 0.0
+    seed: int = 0
+
+    def delay(self, rng: random.Random) -> float:
+        return self.latency + (rng.random() * self.jitter if self.jitter else 0.0)
+
+    def dropped(self, rng: random.Random) -> bool:
+        return self.loss > 0 and rng.random() < self.loss
+
+    def dead(self, key: str) -> bool:
+        # Stable per server, so the same hosts stay dead across refresh cycles
+        return self.timeout > 0 and random.Random(f"{self.seed}:{key}").random() < self.timeout
+
+
+def gamespy_status(index: int, rng: random.Random) -> bytes:
+    players = rng.choice((0, 0, 0, rng.randint(1, 16)))
+    fields = [
+        ("hostname", f"^1Bench ^7server #{index}"), ("gamever", "01.00.10.0621"), ("hostport", "2302"),
+        ("maxplayers", "16"), ("password", "0"), ("mapname", rng.choice(GAMESPY_MAPS)),
+        ("dedicated", "1"), ("gamemode", "openplaying"), ("game_classic", "0"),
+        ("numplayers", str(players)), ("gametype", rng.choice(GAMESPY_GAMETYPES)),
+        ("teamplay", "1"), ("gamevariant", "ctf"), ("fraglimit", "3"), ("player_flags", "1073742210,2"),
+        ("game_flags", "26"),
+    ]
+    for i in range(players):
+        fields += [(f"player_{i}", f"Player{rng.randint(0, 9999)}"), (f"score_{i}", str(rng.randint(0, 50))),
+                   (f"ping_{i}", str(rng.randint(20, 250))), (f"team_{i}", str(i % 2))]
+    fields += [("team_t0", "Red"), ("score_t0", str(rng.randint(0, 3))), ("team_t1", "Blue"), ("score_t1", str(rng.randint(0, 3)))]
+    return "".join(f"\\{key}\\{value}" for key, value in fields).encode()
+
+
+class FakeGameSpyMaster:
+    """A GameSpy master server on 127.0.0.1 that lists the given servers for any game."""
+
+    def __init__(self, servers: List[Tuple[str, int]], faults: FaultProfile = FaultProfile()):
+        self.servers = servers
+        self.faults = faults
+        self.rng = random.Random(faults.seed)
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.requests = 0
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.read(1024)
+            self.requests += 1
+            # [0, len, 0, 1, 3, 0, 0, 0, 0] game \0 game \0 validation key \0 ...
+            fields = request[9:].split(b"\x00")
+            game, validate = fields[0].decode(), fields[2].decode()
+            await asyncio.sleep(self.faults.delay(self.rng))
+            if not self.faults.dead("master") and not self.faults.dropped(self.rng):
+                writer.write(master_list_payload(self.servers, game, validate))
+                await writer.drain()
+            # Like the real master, keep the connection open until the client is done
+            await reader.read()
+        except (ConnectionError, IndexError, KeyError):
+            pass
+        finally:
+            writer.close()
+
+
+class _StatusResponder(asyncio.DatagramProtocol):
+    def __init__(self, owner: "FakeUDPResponders", index: int):
+        self.owner, self.index = owner, index
+        self.transport = None
+        self.payload = gamespy_status(index, random.Random(owner.faults.seed + index))
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        owner = self.owner
+        owner.queries += 1
+        if owner.faults.dead(str(self.index)) or owner.faults.dropped(owner.rng):
+            return
+        delay = owner.faults.delay(owner.rng)
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self.transport.sendto, self.payload, addr)
+        else:
+            self.transport.sendto(self.payload, addr)
+
+
+class FakeUDPResponders:
+    """Game servers answering GameSpy status queries, one UDP socket each.
+
+    The poller matches replies to servers by source address, so every fake server
+    needs its own port; 10k servers need 10k file descriptors.
+    """
+
+    def __init__(self, count: int, faults: FaultProfile = FaultProfile()):
+        self.count = count
+        self.faults = faults
+        self.rng = random.Random(faults.seed)
+        self.transports: List[asyncio.DatagramTransport] = []
+        self.queries = 0
+
+    async def start(self) -> List[Tuple[str, int]]:
+        loop = asyncio.get_running_loop()
+        addresses = []
+        for i in range(self.count):
+            transport, _ = await loop.create_datagram_endpoint(lambda i=i: _StatusResponder(self, i), local_addr=("127.0.0.1", 0))
+            self.transports.append(transport)
+            addresses.append(transport.get_extra_info("sockname")[:2])
+        return addresses
+
+    def close(self):
+        for transport in self.transports:
+            transport.close()
+        self.transports.clear()
+
+
+class FakeHTTPUpstream:
+    """Base for fakes served through httpx.MockTransport; subclasses implement route()."""
+
+    def __init__(self, faults: FaultProfile = FaultProfile()):
+        self.faults = faults
+        self.rng = random.Random(faults.seed)
+        self.requests = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def client(self, **kwargs) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=self.transport(), **kwargs)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        host = f"{request.url.host}:{request.url.port}" if request.url.port else request.url.host
+        timeout = (request.extensions.get("timeout") or {}).get("read") or server.API_TIMEOUT
+        if self.faults.dead(host):
+            await asyncio.sleep(timeout)
+            raise httpx.ReadTimeout("fake upstream did not answer", request=request)
+        await asyncio.sleep(self.faults.delay(self.rng))
+        if self.faults.dropped(self.rng):
+            raise httpx.ConnectError("fake upstream dropped the request", request=request)
+        return self.route(request)
+
+    def route(self, request: httpx.Request) -> httpx.Response:
+        raise NotImplementedError
+
+
+class FakeElDewrito(FakeHTTPUpstream):
+    """ElDewrito master lists plus the status and /mods endpoints of every listed server."""
+
+    def __init__(self, count: int, masters: int = 3, faults: FaultProfile = FaultProfile()):
+        super().__init__(faults)
+        rng = random.Random(faults.seed)
+        self.servers = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}:11775" for i in range(1, count + 1)]
+        self.master_urls = [f"http://master{i}.bench.invalid/list" for i in range(masters)]
+        self.status: Dict[str, dict] = {}
+        for i, ip_port in enumerate(self.servers):
+            map_name, map_file = rng.choice(ELDEWRITO_MAPS)
+            variant, variant_type = rng.choice(ELDEWRITO_VARIANTS)
+            players = rng.choice((0, 0, rng.randint(1, 16)))
+            self.status[ip_port] = {
+                "name": f"Bench server #{i}", "port": 11775, "hostPlayer": f"host{i}", "sprintEnabled": "1",
+                "sprintUnlimitedEnabled": "0", "assassinationEnabled": "0", "voip": True, "teams": True,
+                "map": map_name, "mapFile": map_file, "variant": variant, "variantType": variant_type,
+                "status": "InGame", "numPlayers": players, "maxPlayers": 16, "modCount": 1, "modPackageName": "bench",
+                "modPackageAuthor": "bench", "modPackageHash": f"{i:040x}", "modPackageVersion": "1.0",
+                "xnkid": f"{i:032x}", "xnaddr": f"{i:032x}", "players": [
+                    {"name": f"Player{j}", "serviceTag": "BNCH", "team": j % 2, "uid": f"{i:08x}{j:08x}",
+                     "primaryColor": "#000000", "isAlive": True, "score": j, "kills": j, "assists": 0,
+                     "deaths": 0, "betrayals": 0, "timeSpentAlive": 0, "suicides": 0, "bestStreak": 0}
+                    for j in range(players)],
+                "isDedicated": True, "gameVersion": "1.106708 cert_ms23", "eldewritoVersion": "0.7.1-bench",
+            }
+
+    def write_master_list(self, path: str):
+        import json
+        with open(path, "w") as f:
+            json.dump({"masterServers": [{"list": url} for url in self.master_urls]}, f)
+
+    def route(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url in self.master_urls:
+            return httpx.Response(200, json={"result": {"code": 0, "msg": "OK", "servers": self.servers}})
+        ip_port = f"{request.url.host}:{request.url.port}"
+        status = self.status.get(ip_port)
+        if status is None:
+            return httpx.Response(404)
+        if request.url.path == "/mods":
+            return httpx.Response(200, json={"mods": [{"name": "bench", "version": "1.0", "hash": status["modPackageHash"]}]})
+        return httpx.Response(200, json=status)
+
+
+class FakeCartographer(FakeHTTPUpstream):
+    """The Cartographer list and per-server detail API.
+
+    summarized=False lists bare xuids so the poller fetches servers/{id} for each one,
+    which is the expensive path; True inlines every server in the list.
+    """
+
+    def __init__(self, count: int, summarized: bool = False, faults: FaultProfile = FaultProfile()):
+        super().__init__(faults)
+        rng = random.Random(faults.seed)
+        self.summarized = summarized
+        self.details: Dict[str, dict] = {}
+        for i in range(count):
+            xuid = str(0x0009000000000000 + i)
+            self.details[xuid] = {
+                "xuid": xuid,
+                "dwFilledPublicSlots": rng.choice((0, 0, rng.randint(1, 16))),
+                "dwMaxPublicSlots": 16,
+                "pProperties": [
+                    {"dwPropertyId": 1073775152, "type": 4, "value": f"Bench server #{i}"},
+                    {"dwPropertyId": 1073775141, "type": 4, "value": "Offline benchmark"},
+                    {"dwPropertyId": 268468743, "type": 1, "value": rng.randint(0, 20)},
+                    {"dwPropertyId": 1073775142, "type": 4, "value": rng.choice(("Lockout", "Midship", "Ascension"))},
+                    {"dwPropertyId": 1073775144, "type": 4, "value": rng.choice(("Slayer", "Team Slayer", "CTF"))},
+                    {"dwPropertyId": 268468745, "type": 1, "value": rng.randint(1, 8)},
+                    {"dwPropertyId": 268468753, "type": 1, "value": 2},
+                ],
+            }
+
+    def route(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url == server.CARTOGRAPHER_LIST_URL:
+            listing = list(self.details.values()) if self.summarized else list(self.details)
+            return httpx.Response(200, json=listing)
+        if url.startswith(server.CARTOGRAPHER_SERVER_URL + "/"):
+            detail = self.details.get(url.rsplit("/", 1)[1])
+            return httpx.Response(200, json=detail) if detail else httpx.Response(404)
+        return httpx.Response(404)
+
+
+class FakeUnavailable(FakeHTTPUpstream):
+    """Answers every request with 404, e.g. for the legacy stats import during init_db."""
+
+    def route(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404)
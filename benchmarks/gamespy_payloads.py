@@ -0,0 +1,70 @@
+"""Synthetic GameSpy master server payloads for the benchmarks."""
+import os
+import random
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+def enctypex_encrypt(key: bytes, validate: bytes, plaintext: bytes, ident: Optional[bytes] = None) -> bytes:
+    """Encrypt a master list so that server._enctypex_decoder(key, validate, ...) returns plaintext."""
+    ident = ident if ident is not None else os.urandom(12)
+    header = bytearray(os.urandom(6))
+    header[0] = (len(header) + 1 - 2) ^ 0xec
+    header.append(len(ident) ^ 0xea)
+    encxkey = bytearray(261)
+    server._enctypex_funcx(encxkey, key, bytearray(validate[:8]), ident, len(ident))
+
+    # The decoder feeds ciphertext back into the key state, so the matching encoder
+    # computes the keystream byte first and then solves for the ciphertext byte.
+    k = list(encxkey[:256])
+    s256, s257, s258, s259, s260 = encxkey[256], encxkey[257], encxkey[258], encxkey[259], encxkey[260]
+    out = bytearray()
+    for p in plaintext:
+        s257 = (s257 + k[s256]) & 0xff
+        s256 = (s256 + 1) & 0xff
+        c = k[s260]
+        k[s260] = k[s257]
+        k[s257] = k[s259]
+        k[s259] = k[s256]
+        k[s256] = c
+        s258 = (s258 + k[c]) & 0xff
+        c = k[(k[(k[s259] + k[s257] + k[s260]) & 0xff])]
+        b = k[(k[s258] + k[s256]) & 0xff]
+        d = c ^ b ^ p
+        s260 = d
+        s259 = p
+        out.append(d)
+    return bytes(header) + ident + bytes(out)
+
+
+def synthetic_servers(count: int, seed: int = 0) -> List[Tuple[str, int]]:
+    rng = random.Random(seed)
+    return [(f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}", rng.randint(2302, 2400))
+            for _ in range(count)]
+
+
+def master_list_plaintext(servers: List[Tuple[str, int]], request_ip: str = "127.0.0.1") -> bytes:
+    """Build a decrypted master list in the layout read by server._decode_master_server_response."""
+    out = bytearray(int(b) for b in request_ip.split('.'))
+    out += (6500).to_bytes(2, 'big')
+    out += b'\x00\x00'
+    for ip, port in servers:
+        # Flag A carries three extra bytes, of which the decoder skips two past the address
+        out.append(server.GameSpyFlags.A)
+        out += bytes(int(b) for b in ip.split('.'))
+        out += port.to_bytes(2, 'big')
+        out += b'\x00\x00'
+    out += b'\x00\xff\xff\xff\xff\xff\xff'
+    return bytes(out)
+
+
+def master_list_payload(servers: List[Tuple[str, int]], game: str, validate: str) -> bytes:
+    """Encrypted master reply for a request made with the given game name and validation key."""
+    game_map = {'halom': 'HALOM', 'halor': 'HALOR', 'halod': 'HALOD', 'halomac': 'HALOMAC', 'halomacd': 'HALOMACD', 'halo': 'HALO'}
+    key = server.GameKeys[game_map[game]].value.encode('ascii')
+    return enctypex_encrypt(key, validate.encode('ascii'), master_list_plaintext(servers))
@@ -1,31 +1,108 @@
 import anyio
 import asyncio
+import bisect
+import gzip
+import hashlib
 import json
 import logging
+import signal
 import socket
 import sqlite3
+import threading
 import time
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from email.utils import formatdate
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Set, Any, Optional, Union
+from typing import Awaitable, Callable, Dict, Iterable, List, Set, Any, Optional, Union
 
 import httpx
 import uvicorn
 import re
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 REFRESH_INTERVAL = 15  # seconds
+SCHEDULER_RESTART_MAX = 60  # cap in seconds on the backoff before a crashed background job is restarted
 STATS_INTERVAL = 300   # seconds
 API_TIMEOUT = 5.0      # seconds
+STATS_MAX_POINTS = 10000  # upper bound for ?points= on the stats history endpoints
+STATS_ROLLUP_RESOLUTIONS = (3600, 86400)  # hourly and daily rollup buckets, in seconds
+STATS_RAW_RETENTION_DAYS = 30             # raw samples older than this are compacted into the rollups only
+STATS_COMPACTION_INTERVAL = 86400         # seconds between retention passes
+SERVER_HISTORY_RETENTION_DAYS = 180       # per-server samples kept for /server/{id}/history
+SERVER_DEAD_AFTER = 24 * 3600             # seconds without an answer before a listed server is only rechecked occasionally
+SERVER_DEAD_RECHECK = 3600                # seconds between probes of a dead server
+
+# --- Per-server polling ---
+POLL_POPULATED_INTERVAL = REFRESH_INTERVAL  # servers with players are probed every refresh
+POLL_IDLE_INTERVAL = 60                     # empty servers
+POLL_BACKOFF_MAX = 600                      # cap for the exponential backoff of failing servers
+MASTER_LIST_INTERVAL = 300  # seconds between GameSpy master list refreshes
+MASTER_LIST_RETRY = 60      # seconds before retrying a failed GameSpy master list refresh
+
+# --- Probe scheduling ---
+PROBE_INITIAL_CONCURRENCY = 64
+PROBE_MIN_CONCURRENCY = 16
+PROBE_MAX_CONCURRENCY = 256
+PROBE_PER_HOST_LIMIT = 4       # concurrent probes against one IP (several servers can share a host)
+PROBE_ADJUST_WINDOW = 32       # completed probes between concurrency adjustments
+PROBE_TARGET_LATENCY = 1.0     # seconds, median probe latency above which concurrency backs off
+PROBE_MAX_TIMEOUT_RATE = 0.5   # fraction of timed out probes above which concurrency backs off
+
+# --- Reverse DNS ---
+RDNS_CACHE_SIZE = 8192
+RDNS_TTL = 6 * 3600            # seconds to keep a resolved hostname
+RDNS_NEGATIVE_TTL = 15 * 60    # seconds to remember that an address has no PTR record
+RDNS_WORKERS = 4
+
+# --- ElDewrito /mods cache ---
+MODS_CACHE_SIZE = 4096
+MODS_TTL = 30 * 60             # seconds before mods are refetched even if the server looks unchanged
+MODS_FAILURE_TTL = 60          # seconds before retrying a server whose /mods request failed
+MODS_FINGERPRINT_KEYS = ("eldewritoVersion", "map", "mapFile", "variant", "variantType")
+
+# --- API snapshots ---
+SNAPSHOT_GZIP_LEVEL = 6
+SNAPSHOT_BROTLI_QUALITY = 5    # only used when the optional brotli package is installed
+SNAPSHOT_ZSTD_LEVEL = 6        # only used when the optional zstandard package is installed
+SNAPSHOT_ENCODING_PREFERENCE = ("br", "zstd", "gzip")
+SNAPSHOT_DIFF_HISTORY = 40     # published versions kept for ?since= requests (10 minutes at REFRESH_INTERVAL)
+
+# --- Live update streams ---
+STREAM_QUEUE_SIZE = 4          # undelivered updates before a slow subscriber is dropped
+STREAM_KEEPALIVE = 20          # seconds between keepalive comments on an idle stream
+
+# --- Metrics ---
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_REFRESH_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0)
+LOOP_LAG_INTERVAL = 1.0        # seconds between event loop lag measurements
 DB_PATH = "database/database.sqlite"
+DB_READERS = 2             # read-only connections for history queries
+DB_SYNCHRONOUS = "NORMAL"  # durable across crashes in WAL mode, without an fsync per commit
+DB_CACHED_STATEMENTS = 64
+DB_BUSY_TIMEOUT_MS = 5000
 
 # --- ElDewrito configuration ---
 ELDEWRITO_MASTER_LIST = "dewrito.json"
 LEGACY_ELDEWRITO_STATS_URL = "https://eldewrito.pauwlo.com/api/stats"
+LEGACY_IMPORT_CHUNK_ROWS = 20000  # legacy data points staged per transaction
 
 # --- Cartographer configuration ---
 CARTOGRAPHER_BASE = "https://cartographer.online"
@@ -131,6 +208,12 @@ class GameKeys(Enum):
     HALOR = "e4Rd9J"
 
 GAMESPY_IP_PORT_LENGTH = 6
+GAMESPY_MASTER_BUFFER_SIZE = 64 * 1024
+GAMESPY_MASTER_HOST = "hosthpc.com"
+GAMESPY_MASTER_PORT = 28910
+GAMESPY_QUERY_RATE = 2000                # status queries sent per second; bursts overflow socket buffers
+GAMESPY_QUERY_RETRIES = 2                # extra queries to servers that have not answered yet
+GAMESPY_RECV_BUFFER_SIZE = 4 * 1024 * 1024  # SO_RCVBUF for the status query socket
 
 class GameSpyFlags:
     A, B, C, D = 0x02, 0x08, 0x10, 0x20
@@ -152,6 +235,7 @@ class GameSpyServerResponse:
     port: int
     game: Optional[str]
     data: Union[str, Dict[str, Any]]
+    rtt: Optional[float] = None
 
 # GameSpy Decryption Algorithm
 def _enctypex_func5(encxkey: bytearray, cnt: int, id_bytes: bytes, idlen: int, n1: int, n2: int) -> tuple:
@@ -237,6 +321,33 @@ def _enctypex_func6(encxkey: bytearray, data: bytearray, length: int) -> int:
     for i in range(length): data[i] = _enctypex_func7(encxkey, data[i])
     return length
 
+def _enctypex_decrypt(encxkey: bytearray, data: bytearray, start: int = 0, end: Optional[int] = None) -> int:
+    # Same keystream as _enctypex_func6/_enctypex_func7 (kept as the reference implementation),
+    # but with the key state held in locals instead of round-tripping through encxkey per byte
+    if end is None: end = len(data)
+    k = list(encxkey[:256])
+    s256, s257, s258, s259, s260 = encxkey[256], encxkey[257], encxkey[258], encxkey[259], encxkey[260]
+    out = []
+    append = out.append
+    for d in data[start:end]:
+        s257 = (s257 + k[s256]) & 0xff
+        s256 = (s256 + 1) & 0xff
+        c = k[s260]
+        k[s260] = k[s257]
+        k[s257] = k[s259]
+        k[s259] = k[s256]
+        k[s256] = c
+        s258 = (s258 + k[c]) & 0xff
+        c = k[(k[(k[s259] + k[s257] + k[s260]) & 0xff])]
+        b = k[(k[s258] + k[s256]) & 0xff]
+        s260 = d
+        s259 = c ^ b ^ d
+        append(s259)
+    data[start:end] = out
+    encxkey[:256] = bytes(k)
+    encxkey[256], encxkey[257], encxkey[258], encxkey[259], encxkey[260] = s256, s257, s258, s259, s260
+    return end - start
+
 def _enctypex_funcx(encxkey: bytearray, key: bytes, encxvalidate: bytearray, data: bytes, datalen: int):
     keylen = len(key)
     for i in range(datalen):
@@ -263,7 +374,7 @@ def _enctypex_decoder(key: bytes, validate: bytes, data: bytes) -> bytes:
     result, offset = _enctypex_init(encxkey, key, validate, data_array)
     if result is None: return None
     result_array = bytearray(result)
-    _enctypex_func6(encxkey, result_array, len(result_array))
+    _enctypex_decrypt(encxkey, result_array)
     return bytes(result_array)
 
 def _gamespy_decryptx(key: str, validate: str, data: bytes) -> bytes:
@@ -274,58 +385,122 @@ def _gamespy_decryptx(key: str, validate: str, data: bytes) -> bytes:
 def _make_validation_key() -> str:
     return format(int(time.time() * 1000), 'x')[-8:].zfill(8)
 
-class GameSpyUDPClient:
-    def __init__(self):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.settimeout(0.1)
-    def close(self):
-        try: self.socket.close()
-        except: pass
+class GameSpyUDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, servers: List[GameSpyServer]):
+        self.games = {(s.address, s.port): s.game for s in servers}
+        self.pending = set(self.games)
+        self.sent: Dict[tuple, float] = {}
+        self.retried: Set[tuple] = set()
+        self.responses: List[GameSpyServerResponse] = []
+        self.done = asyncio.get_running_loop().create_future()
+        self.transport = None
+        if not self.pending: self.done.set_result(None)
+    def connection_made(self, transport):
+        self.transport = transport
+    def datagram_received(self, data: bytes, addr):
+        if addr[:2] in self.games and addr[:2] not in self.pending: return  # answer to a retried query
+        self.pending.discard(addr[:2])
+        # Karn's rule: once a server has been queried twice it is unknown which query a reply answers
+        sent = self.sent.get(addr[:2]) if addr[:2] not in self.retried else None
+        rtt = time.monotonic() - sent if sent is not None else None
+        self.responses.append(GameSpyServerResponse(addr[0], addr[1], self.games.get(addr[:2]), data.decode('utf-8', errors='ignore'), rtt))
+        if not self.pending and not self.done.done(): self.done.set_result(None)
+    def error_received(self, exc):
+        logger.debug(f"GameSpy UDP error: {exc}")
+    def connection_lost(self, exc):
+        if not self.done.done(): self.done.set_result(None)
     def send_query(self, address: str, port: int, data: str):
+        if (address, port) in self.sent: self.retried.add((address, port))
+        try: self.transport.sendto(data.encode('utf-8'), (address, port)); self.sent[(address, port)] = time.monotonic()
+        except Exception: self.pending.discard((address, port))
+
+class GameSpyMasterStream:
+    """Incrementally decrypts a master server reply in place and detects the end-of-list marker."""
+    def __init__(self, key: bytes, validate: bytes, size: int = GAMESPY_MASTER_BUFFER_SIZE):
+        self.key, self.validate = key, validate
+        self.encxkey = bytearray(261)
+        self.buffer = bytearray(size)
+        self.size = 0
+        self.start = None
+        self.decrypted = 0
+        self.scanner = 0
+        self.header_parsed = False
+        self.complete = False
+        self.decrypt_time = 0.0
+    @property
+    def plaintext(self) -> Optional[bytes]:
+        return bytes(self.buffer[self.start:self.decrypted]) if self.start is not None else None
+    def feed(self, chunk: bytes):
+        end = self.size + len(chunk)
+        if end > len(self.buffer): self.buffer.extend(bytes(max(len(self.buffer), end - len(self.buffer))))
+        self.buffer[self.size:end] = chunk
+        self.size = end
+        started = time.perf_counter()
         try:
-            self.socket.sendto(data.encode('utf-8'), (address, port))
-            return True
-        except: return False
-    async def write(self, address: str, port: int, data: str):
-        return await asyncio.get_event_loop().run_in_executor(None, self.send_query, address, port, data)
-    def receive_responses(self, end_delay: float = 0.5) -> Optional[List[Dict]]:
-        responses = []
-        last_receive_time = time.time()
-        while True:
-            try:
-                data, addr = self.socket.recvfrom(4096)
-                responses.append({'address': addr[0], 'port': addr[1], 'data': data})
-                last_receive_time = time.time()
-            except socket.timeout:
-                if time.time() - last_receive_time > end_delay: break
-            except: break
-        return responses if responses else None
-    async def read_all(self, end_delay: float = 0.5) -> Optional[List[Dict]]:
-        return await asyncio.get_event_loop().run_in_executor(None, self.receive_responses, end_delay)
+            if self.start is None and not self._init(): return
+            _enctypex_decrypt(self.encxkey, self.buffer, self.decrypted, end)
+            self.decrypted = end
+            self._scan()
+        finally: self.decrypt_time += time.perf_counter() - started
+    def _init(self) -> bool:
+        data, size = self.buffer, self.size
+        if size < 1: return False
+        a = (data[0] ^ 0xec) + 2
+        if size < a: return False
+        b = data[a - 1] ^ 0xea
+        if size < a + b: return False
+        _enctypex_funcx(self.encxkey, self.key, bytearray(self.validate[:8]), bytes(data[a:a+b]), b)
+        self.start = self.decrypted = self.scanner = a + b
+        return True
+    def _scan(self):
+        # Mirrors the layout walked by _decode_master_server_response
+        data, end, s = self.buffer, self.decrypted, self.scanner
+        if not self.header_parsed:
+            if end < s + GAMESPY_IP_PORT_LENGTH: return
+            if (data[s+4] << 8) | data[s+5] == 0xFFFF: self.complete = True; return
+            s += GAMESPY_IP_PORT_LENGTH
+            for _ in range(2):
+                if s >= end: return
+                s += data[s] + 1
+            self.header_parsed = True
+        while s < end:
+            flag = data[s]
+            if s + 1 + GAMESPY_IP_PORT_LENGTH > end: break
+            if flag == 0 and data[s+1:s+5] == b'\xff\xff\xff\xff': self.complete = True; break
+            s += GAMESPY_IP_PORT_LENGTH + (3 if flag & GameSpyFlags.A else 0) + (4 if flag & GameSpyFlags.B else 0) + (2 if flag & GameSpyFlags.C else 0) + (2 if flag & GameSpyFlags.D else 0)
+        self.scanner = s
 
 class GameSpyTCPClient:
     def __init__(self, host: str, port: int, timeout: float = 5.0):
         self.host, self.port, self.timeout = host, port, timeout
-        self.socket = None
+        self.reader = self.writer = None
+        self.bytes_received, self.elapsed, self.decrypt_time = 0, 0.0, 0.0
     async def connect(self):
-        def _conn():
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.settimeout(self.timeout)
-            self.socket.connect((self.host, self.port))
-        await asyncio.get_event_loop().run_in_executor(None, _conn)
-    async def request(self, data: bytes) -> bytes:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, self.socket.sendall, data)
-        response = b''
-        while True:
-            try:
-                chunk = await asyncio.wait_for(loop.run_in_executor(None, self.socket.recv, 4096), timeout=1.0)
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout=self.timeout)
+    async def request(self, data: bytes, key: str, validate: str) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.timeout
+        stream = GameSpyMasterStream(key.encode('ascii'), validate.encode('ascii'))
+        try:
+            self.writer.write(data)
+            await self.writer.drain()
+            while not stream.complete:
+                remaining = deadline - loop.time()
+                if remaining <= 0: break
+                try: chunk = await asyncio.wait_for(self.reader.read(GAMESPY_MASTER_BUFFER_SIZE), timeout=remaining)
+                except asyncio.TimeoutError: break
                 if not chunk: break
-                response += chunk
-            except asyncio.TimeoutError: break
-        return response
+                stream.feed(chunk)
+        finally:
+            self.bytes_received, self.elapsed, self.decrypt_time = stream.size, loop.time() - start, stream.decrypt_time
+        # A list cut short by the deadline or an early EOF is a failed fetch, not a shorter list
+        if not stream.complete:
+            logger.warning(f"GameSpy master {self.host}:{self.port} list incomplete after {self.bytes_received} bytes")
+            return None
+        return stream.plaintext
     def close(self):
-        if self.socket: self.socket.close()
+        if self.writer: self.writer.close()
 
 def _encode_master_server_request(game: str, validation_key: str) -> bytes:
     def cstring(s: str) -> List[int]: return [ord(c) for c in s] + [0]
@@ -359,64 +534,133 @@ def _decode_master_server_response(data: bytes) -> Optional[Dict]:
         servers.append(GameSpyServerAddress(address=ip, port=port))
     return {'request_ip': request_ip, 'servers': servers}
 
-async def _get_gamespy_master_server_list(game, host="hosthpc.com", port=28910, timeout=5.0):
+async def _get_gamespy_master_server_list(game, host=GAMESPY_MASTER_HOST, port=GAMESPY_MASTER_PORT, timeout=5.0, source=None) -> Optional[List[GameSpyServerAddress]]:
+    """Fetch a complete master list, or None if the fetch failed or the list was cut short.
+
+    source labels the refresh_phase_seconds samples and defaults to the game key.
+    """
     game_map = {'halom':'HALOM','halor':'HALOR','halod':'HALOD','halomac':'HALOMAC','halomacd':'HALOMACD','halo':'HALO'}
     game_enum = game_map.get(game.lower())
-    if not game_enum: return []
+    if not game_enum: return None
     client = GameSpyTCPClient(host, port, timeout)
     try:
         await client.connect()
         vkey = _make_validation_key()
-        encrypted = await client.request(_encode_master_server_request(game, vkey))
-        decrypted = _gamespy_decryptx(GameKeys[game_enum].value, vkey, encrypted)
+        decrypted = await client.request(_encode_master_server_request(game, vkey), GameKeys[game_enum].value, vkey)
+        logger.info(f"GameSpy master {host}:{port} ({game}): {client.bytes_received} bytes in {client.elapsed:.3f}s")
+        source = source or game
+        refresh_phase_seconds.observe(client.elapsed - client.decrypt_time, source=source, phase="master_fetch", host=host)
+        # Decryption happens while the list streams in, so it is added to the parse time as one decode sample
+        started = time.perf_counter()
         decoded = _decode_master_server_response(decrypted) if decrypted else None
-        return decoded['servers'] if decoded else []
-    except: return []
+        refresh_phase_seconds.observe(client.decrypt_time + time.perf_counter() - started, source=source, phase="master_decode", host=host)
+        return decoded['servers'] if decoded else None
+    except: return None
     finally: client.close()
 
-async def _resolve_gamespy_servers(args, master_host="hosthpc.com", master_port=28910, timeout=5.0):
+class GameSpyMasterRegistry:
+    """Caches master server lists so status polling only re-queries known servers between master refreshes."""
+    def __init__(self, interval: float = MASTER_LIST_INTERVAL, retry: float = MASTER_LIST_RETRY):
+        self.interval, self.retry = interval, retry
+        self.entries: Dict[tuple, tuple] = {}
+        self.refreshing: Dict[tuple, asyncio.Task] = {}
+    async def get(self, game: str, host: str, port: int, timeout: float, source: Optional[str] = None) -> List[GameSpyServerAddress]:
+        key = (game, host, port)
+        entry = self.entries.get(key)
+        if entry is None: return await self.refresh(game, host, port, timeout, source)
+        expires_at, servers = entry
+        # Serve the known list and refresh it in the background once it goes stale
+        if time.monotonic() >= expires_at and key not in self.refreshing:
+            task = asyncio.create_task(self.refresh(game, host, port, timeout, source))
+            self.refreshing[key] = task
+            task.add_done_callback(lambda _: self.refreshing.pop(key, None))
+        return servers
+    async def refresh(self, game: str, host: str, port: int, timeout: float, source: Optional[str] = None) -> List[GameSpyServerAddress]:
+        key = (game, host, port)
+        servers = await _get_gamespy_master_server_list(game, host, port, timeout, source)
+        # Only a complete, non-empty list replaces the known one for a full interval
+        if servers:
+            self.entries[key] = (time.monotonic() + self.interval, servers)
+            return servers
+        # Keep serving the previous list after a failed or truncated fetch, but try the master again sooner
+        previous = self.entries.get(key)
+        if previous:
+            self.entries[key] = (time.monotonic() + self.retry, previous[1])
+            return previous[1]
+        return []
+
+gamespy_master_registry = GameSpyMasterRegistry()
+
+async def _resolve_gamespy_servers(args, master_host=GAMESPY_MASTER_HOST, master_port=GAMESPY_MASTER_PORT, timeout=5.0, source=None):
     servers = []
     game_map = {'ce':'halom','pc':'halor','trial':'halod','mac':'halomac','macdemo':'halomacd','beta':'halo'}
     for arg in args:
         if isinstance(arg, str):
             game_key = game_map.get(arg.lower(), arg)
-            s_list = await _get_gamespy_master_server_list(game_key, master_host, master_port, timeout)
+            s_list = await gamespy_master_registry.get(game_key, master_host, master_port, timeout, source)
             servers.extend([GameSpyServer(s.address, s.port, arg) for s in s_list])
         else: servers.append(GameSpyServer(arg.address, arg.port))
     return servers
 
-async def _query_gamespy_server_info(servers, timeout=2.0):
+async def _send_gamespy_queries(protocol: GameSpyUDPProtocol, targets: List[tuple], rate: int):
+    # Paced in 10 ms batches; rate <= 0 sends everything at once
+    loop = asyncio.get_running_loop()
+    batch = max(1, rate // 100) if rate > 0 else len(targets)
+    started = loop.time()
+    for i in range(0, len(targets), batch):
+        delay = started + i / rate - loop.time() if rate > 0 else 0
+        if delay > 0: await asyncio.sleep(delay)
+        for address, port in targets[i:i + batch]: protocol.send_query(address, port, '\\')
+
+async def _query_gamespy_server_info(servers, timeout=2.0, rate=GAMESPY_QUERY_RATE, retries=GAMESPY_QUERY_RETRIES):
     if not servers: return None
-    address_game_map = {f"{s.address}:{s.port}": s.game for s in servers}
-    client = GameSpyUDPClient()
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(lambda: GameSpyUDPProtocol(servers), family=socket.AF_INET)
     try:
-        for s in servers: await client.write(s.address, s.port, '\\')
-        await asyncio.sleep(0.2)
-        responses = await client.read_all(end_delay=timeout)
-        if not responses: return None
-        return [GameSpyServerResponse(r['address'], r['port'], address_game_map.get(f"{r['address']}:{r['port']}"), r['data'].decode('utf-8', errors='ignore')) for r in responses]
-    finally: client.close()
+        try: transport.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, GAMESPY_RECV_BUFFER_SIZE)
+        except OSError as e: logger.debug(f"Could not enlarge the GameSpy UDP receive buffer: {e}")
+        # Attempts split the timeout, so retrying servers that never answer does not lengthen the refresh
+        targets = list(protocol.games)
+        for attempt in range(retries + 1):
+            await _send_gamespy_queries(protocol, targets, rate)
+            try: await asyncio.wait_for(asyncio.shield(protocol.done), timeout=timeout / (retries + 1))
+            except asyncio.TimeoutError: pass
+            targets = [target for target in targets if target in protocol.pending]
+            if not targets: break
+        return protocol.responses or None
+    finally: transport.close()
+
+# ^ followed by a digit or lowercase letter is a color code; non-ASCII followers are checked with str.isdigit/islower
+_GAMESPY_COLOR_CODE = re.compile(r'\^(?:[0-9a-z]|([^\x00-\x7f]))')
+# Control characters (including \t\n\r) and DEL are dropped
+_GAMESPY_CONTROL = re.compile(r'[\x00-\x1f\x7f]')
+_GAMESPY_FLOAT = re.compile(r'^\d+\.\d+$')
+_GAMESPY_PLAYER_KEY = re.compile(r'^(player|score|ping|team)_(\d+)$')
+_GAMESPY_PLAYER_FIELDS = {'player': 'name', 'score': 'score', 'ping': 'ping', 'team': 'team'}
+
+def _strip_color_code(match: re.Match) -> str:
+    c = match.group(1)
+    return match.group(0) if c and not (c.isdigit() or c.islower()) else ''
 
 def _clean_gamespy_string(s: str) -> str:
-    result, i = [], 0
-    while i < len(s):
-        c = s[i]
-        if ord(c) < 32 and c not in '\t\n\r': i += 1; continue
-        if c == '^' and i + 1 < len(s) and (s[i+1].isdigit() or s[i+1].islower()): i += 2; continue
-        if c == '\\': result.append('/'); i += 1; continue
-        if 32 <= ord(c) < 127 or ord(c) >= 128: result.append(c)
-        i += 1
-    return ''.join(result)
+    if '^' in s: s = _GAMESPY_COLOR_CODE.sub(_strip_color_code, s)
+    if s.isprintable() and '\\' not in s: return s  # nothing to drop or replace, the common case
+    return _GAMESPY_CONTROL.sub('', s).replace('\\', '/')
 
 def _parse_gamespy_server_info(response_str: str) -> Dict[str, Any]:
     parts = response_str.split('\\')
     if parts and parts[0] == '': parts = parts[1:]
-    info = {}
+    info, players = {}, {}
+    match_float, match_player = _GAMESPY_FLOAT.match, _GAMESPY_PLAYER_KEY.match
     for i in range(0, len(parts) - 1, 2):
         key, value = parts[i], _clean_gamespy_string(parts[i+1])
         if value.isdigit(): value = int(value)
-        elif re.match(r'^\d+\.\d+$', value): value = float(value)
+        elif '.' in value and match_float(value): value = float(value)
         info[key] = value
+        player = match_player(key) if key[-1:].isdigit() else None
+        if player: players.setdefault(int(player.group(2)), {})[_GAMESPY_PLAYER_FIELDS[player.group(1)]] = value
+    # player_N/score_N/ping_N/team_N stay as flat keys and are also folded into a list ordered by N
+    if players and 'players' not in info: info['players'] = [players[n] for n in sorted(players)]
     return info
 
 # --- Logging Setup ---
@@ -424,14 +668,634 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 # --- Global State (Cache) ---
-eldewrito_cache: Dict[str, Any] = {}
-cartographer_cache: Dict[str, Any] = {}
-cartographer_summarized_cache: Dict[str, Any] = {}
-haloce_cache: Dict[str, Any] = {}
-halopc_cache: Dict[str, Any] = {}
 
 app = FastAPI()
 
+# --- Metrics ---
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric(ABC):
+    """A metric family in the Prometheus text format; values are keyed by label values in labelnames order."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()  # the database writer thread records metrics too
+        metrics_registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines for every label set, without the HELP and TYPE header."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(Metric):
+    """A gauge that is either set directly or read from callback() at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback: Optional[Callable[[], Dict[tuple, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = dict(self.values)
+        if self.callback is not None:
+            values.update(self.callback())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = METRICS_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[tuple, list] = {}  # label values -> [count per bucket..., count above the last bucket, sum]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 2)
+            state[i] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            values = [(key, list(state)) for key, state in self.values.items()]
+        names = self.labelnames + ("le",)
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+metrics_registry: List[Metric] = []
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in metrics_registry) + "\n"
+
+def _url_host(url: str) -> str:
+    return httpx.URL(url).host
+
+# Phases: master_fetch, master_decode, probe, rdns, mods, summarize, publish, db_write.
+# host is the upstream (master server or API) where there is one; per-server probes leave it empty.
+refresh_phase_seconds = Histogram("refresh_phase_seconds", "Time spent in each phase of a source refresh.", ("source", "phase", "host"))
+refresh_seconds = Histogram("refresh_seconds", "Duration of a whole source refresh.", ("source",), buckets=METRICS_REFRESH_BUCKETS)
+refresh_total = Counter("refresh_total", "Source refreshes by result.", ("source", "result"))
+probes_total = Counter("probes_total", "Per-server probes by result.", ("source", "result"))
+cache_lookups_total = Counter("cache_lookups_total", "TTL cache lookups by result (hit, stale or miss).", ("cache", "result"))
+event_loop_lag_seconds = Gauge("event_loop_lag_seconds", "How late the event loop woke up a timer, last measured.")
+cache_age_seconds = Gauge("cache_age_seconds", "Seconds since each source last published its cache.", ("source",), callback=lambda: {
+    (name,): time.time() - source.published_at for name, source in sources.items() if source.published_at is not None
+})
+executor_queue_depth = Gauge("executor_queue_depth", "Jobs waiting for a worker thread.", ("executor",))
+
+class CountingThreadPoolExecutor(ThreadPoolExecutor):
+    """A thread pool that counts submitted jobs in executor_queue_depth until a worker picks them up or they are cancelled."""
+
+    def __init__(self, max_workers: Optional[int] = None, thread_name_prefix: str = "default"):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.label = thread_name_prefix
+        executor_queue_depth.inc(0, executor=self.label)
+
+    def submit(self, fn, /, *args, **kwargs):
+        dequeued = threading.Lock()
+
+        def leave_queue(*_):
+            # Runs once: when a worker starts the job, or when its future finishes without running
+            if dequeued.acquire(blocking=False):
+                executor_queue_depth.inc(-1, executor=self.label)
+
+        def run():
+            leave_queue()
+            return fn(*args, **kwargs)
+
+        executor_queue_depth.inc(executor=self.label)
+        try:
+            future = super().submit(run)
+        except BaseException:
+            leave_queue()
+            raise
+        future.add_done_callback(leave_queue)
+        return future
+
+# --- HTTP Client Pools ---
+
+@dataclass
+class HTTPUpstream:
+    """Connection settings for one application-scoped httpx client."""
+    limits: httpx.Limits
+    verify: bool = True
+    http2: bool = False
+
+HTTP_UPSTREAMS: Dict[str, HTTPUpstream] = {
+    # Master lists, game server status and /mods (plain HTTP, one host per server)
+    "eldewrito": HTTPUpstream(limits=httpx.Limits(max_connections=512, max_keepalive_connections=512, keepalive_expiry=REFRESH_INTERVAL * 2)),
+    # api.eldewrito.org, stats.eldewrito.org and the legacy stats API
+    "eldewrito_api": HTTPUpstream(limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0), http2=True),
+    # Cartographer serves a certificate that does not validate
+    "cartographer": HTTPUpstream(limits=httpx.Limits(max_connections=CARTOGRAPHER_WORKERS * 2, max_keepalive_connections=CARTOGRAPHER_WORKERS, keepalive_expiry=REFRESH_INTERVAL * 2), verify=False),
+}
+
+http_clients: Dict[str, httpx.AsyncClient] = {}
+
+def open_http_clients():
+    """Create the shared HTTP clients, one pool per upstream."""
+    for name, upstream in HTTP_UPSTREAMS.items():
+        if name not in http_clients:
+            http_clients[name] = httpx.AsyncClient(limits=upstream.limits, verify=upstream.verify, http2=upstream.http2)
+
+async def close_http_clients():
+    """Close the shared HTTP clients and their pooled connections."""
+    clients = list(http_clients.values())
+    http_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """Return the shared HTTP client for an upstream, creating the pools on first use."""
+    if name not in http_clients:
+        open_http_clients()
+    return http_clients[name]
+
+# --- TTL Cache ---
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, maxsize: int, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name  # label for cache_lookups_total; unnamed caches are not exported
+        self.entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, result: str):
+        if result == "hit":
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name is not None:
+            cache_lookups_total.inc(cache=self.name, result=result)
+
+    def get(self, key: Any, default: Any = _MISSING) -> Any:
+        """Return the cached value for key, or default if it is missing or expired."""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self._count("miss")
+            return default
+        self.entries.move_to_end(key)
+        self._count("hit")
+        return entry[1]
+
+    def get_stale(self, key: Any, default: Any = _MISSING) -> tuple:
+        """Return (value, fresh); expired entries are still returned, with fresh False, until replaced or evicted."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self._count("miss")
+            return default, False
+        self.entries.move_to_end(key)
+        if entry[0] <= time.monotonic():
+            self._count("stale")
+            return entry[1], False
+        self._count("hit")
+        return entry[1], True
+
+    def set(self, key: Any, value: Any, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+# --- Probe Scheduling ---
+
+class ProbeScheduler:
+    """Limits concurrent server probes globally and per host, adapting the global limit to probe latency and timeouts."""
+
+    def __init__(self, initial: int = PROBE_INITIAL_CONCURRENCY, minimum: int = PROBE_MIN_CONCURRENCY,
+                 maximum: int = PROBE_MAX_CONCURRENCY, per_host: int = PROBE_PER_HOST_LIMIT, timeout: float = API_TIMEOUT):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.per_host = per_host
+        self.timeout = timeout
+        self.active = 0
+        self.condition = asyncio.Condition()
+        self.hosts: Dict[str, asyncio.Semaphore] = {}
+        self.host_users: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.timeouts = 0
+
+    async def run(self, host: str, probe: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Run probe(*args) once both a global and a per-host slot are free."""
+        semaphore = self.hosts.get(host)
+        if semaphore is None:
+            semaphore = self.hosts[host] = asyncio.Semaphore(self.per_host)
+        self.host_users[host] = self.host_users.get(host, 0) + 1
+        try:
+            async with semaphore:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: self.active < self.limit)
+                    self.active += 1
+                start = time.monotonic()
+                try:
+                    return await probe(*args)
+                finally:
+                    elapsed = time.monotonic() - start
+                    async with self.condition:
+                        self.active -= 1
+                        self._record(elapsed)
+                        self.condition.notify(max(1, self.limit - self.active))
+        finally:
+            self.host_users[host] -= 1
+            if not self.host_users[host]:
+                del self.host_users[host]
+                del self.hosts[host]
+
+    def _record(self, elapsed: float):
+        # Probes that ran into the request timeout count as timeouts, everything else as a latency sample
+        if elapsed >= self.timeout:
+            self.timeouts += 1
+        else:
+            self.latencies.append(elapsed)
+        samples = len(self.latencies) + self.timeouts
+        if samples < PROBE_ADJUST_WINDOW:
+            return
+
+        timeout_rate = self.timeouts / samples
+        latency = sorted(self.latencies)[len(self.latencies) // 2] if self.latencies else 0.0
+        previous = self.limit
+        if timeout_rate > PROBE_MAX_TIMEOUT_RATE or latency > PROBE_TARGET_LATENCY:
+            self.limit = max(self.minimum, int(self.limit * 0.75))
+        else:
+            self.limit = min(self.maximum, self.limit + max(1, self.limit // 8))
+        if self.limit != previous:
+            logger.debug(f"Probe concurrency {previous} -> {self.limit} (median latency {latency:.3f}s, timeout rate {timeout_rate:.0%})")
+        self.latencies.clear()
+        self.timeouts = 0
+
+eldewrito_probe_scheduler = ProbeScheduler()
+
+# --- API Snapshots ---
+
+@dataclass(frozen=True)
+class CacheSnapshot:
+    """A published cache, pre-encoded so API requests can be served straight from bytes."""
+    version: int
+    data: Dict[str, Any]
+    servers: Dict[str, Any]
+    body: bytes
+    encodings: Dict[str, bytes]
+    etag: str
+    last_modified: str
+
+@dataclass(frozen=True)
+class CacheDiff:
+    """Servers that differ between a published version and the one before it."""
+    version: int
+    added: Dict[str, Any]
+    changed: Dict[str, Any]
+    removed: List[str]
+
+snapshots: Dict[str, CacheSnapshot] = {}
+snapshot_diffs: Dict[str, deque] = {}
+snapshot_patches: Dict[str, Dict[int, bytes]] = {}
+
+# Versions restart at 1 with every process, so the tokens handed to clients (X-Cache-Version,
+# patch versions, event ids) carry an epoch; a token from another process gets a full resync
+snapshot_epoch = format(time.time_ns() // 1_000_000, "x")
+
+def version_token(version: int) -> str:
+    return f"{snapshot_epoch}-{version}"
+
+def parse_version_token(token: Optional[str]) -> Optional[int]:
+    """Return the version a token names, or None if it is malformed or from another process."""
+    epoch, _, version = (token or "").strip().rpartition("-")
+    if epoch != snapshot_epoch or not version.isdigit():
+        return None
+    return int(version)
+
+def encode_json(data: Any) -> bytes:
+    """Encode data the same way JSONResponse does."""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def server_key(server: Dict[str, Any]) -> str:
+    """Identify a listed server: Cartographer servers by xuid, GameSpy servers by address:port."""
+    if 'xuid' in server:
+        return str(server['xuid'])
+    return f"{server.get('address')}:{server.get('port')}"
+
+def keyed_servers(data: Dict[str, Any]) -> Dict[str, Any]:
+    servers = data.get("servers") or {}
+    if isinstance(servers, dict):
+        return servers
+    return {server_key(server): server for server in servers if isinstance(server, dict)}
+
+def build_snapshot(data: Dict[str, Any], previous: Optional[CacheSnapshot] = None) -> tuple:
+    """Encode a cache as JSON plus compressed variants, and diff its servers against the previous version."""
+    body = encode_json(data)
+    encodings = {"gzip": gzip.compress(body, compresslevel=SNAPSHOT_GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body, quality=SNAPSHOT_BROTLI_QUALITY)
+    if zstandard is not None:
+        encodings["zstd"] = zstandard.ZstdCompressor(level=SNAPSHOT_ZSTD_LEVEL).compress(body)
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    last_modified = data.get("updatedAt") or get_current_http_date()
+
+    servers = keyed_servers(data)
+    version = previous.version + 1 if previous else 1
+    old = previous.servers if previous else {}
+    added, changed = {}, {}
+    for key, server in servers.items():
+        if key not in old:
+            added[key] = server
+        elif old[key] != server:
+            changed[key] = server
+    removed = [key for key in old if key not in servers]
+
+    snapshot = CacheSnapshot(version=version, data=data, servers=servers, body=body, encodings=encodings, etag=etag, last_modified=last_modified)
+    return snapshot, CacheDiff(version=version, added=added, changed=changed, removed=removed)
+
+async def publish_snapshot(name: str, data: Dict[str, Any]) -> CacheSnapshot:
+    """Encode a freshly built cache off the event loop and make it the one served by the API."""
+    snapshot, diff = await asyncio.to_thread(build_snapshot, data, snapshots.get(name))
+    snapshots[name] = snapshot
+    snapshot_diffs.setdefault(name, deque(maxlen=SNAPSHOT_DIFF_HISTORY)).append(diff)
+    snapshot_patches[name] = {}
+    await broadcast_snapshot(name, snapshot)
+    return snapshot
+
+def build_patch(name: str, snapshot: CacheSnapshot, since: int) -> Optional[Dict[str, Any]]:
+    """Merge the diffs published after version since, or None if they are no longer all retained."""
+    diffs = [diff for diff in snapshot_diffs.get(name, ()) if diff.version > since]
+    if since > snapshot.version or len(diffs) != snapshot.version - since:
+        return None
+
+    # A key's first event tells whether it existed at version since, the latest snapshot whether it exists now
+    existed: Dict[str, bool] = {}
+    for diff in diffs:
+        for key in diff.added:
+            existed.setdefault(key, False)
+        for key in diff.changed:
+            existed.setdefault(key, True)
+        for key in diff.removed:
+            existed.setdefault(key, True)
+
+    added, changed, removed = {}, {}, []
+    for key, was_present in existed.items():
+        if key in snapshot.servers:
+            (changed if was_present else added)[key] = snapshot.servers[key]
+        elif was_present:
+            removed.append(key)
+
+    return {
+        "version": version_token(snapshot.version),
+        "since": version_token(since),
+        "count": snapshot.data.get("count"),
+        "updatedAt": snapshot.data.get("updatedAt"),
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+    }
+
+def _accepted_encodings(header: str) -> Set[str]:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def snapshot_response(request: Request, name: str, since: Optional[str] = None) -> Response:
+    """Serve a source's snapshot, or only the servers changed since a version when since is given.
+
+    Conditional requests are answered with 304 and compression is negotiated from Accept-Encoding.
+    A since version that has aged out of the diff history, or comes from before a restart, gets the full snapshot instead.
+    """
+    snapshot = snapshots[name]
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    coding = next((coding for coding in SNAPSHOT_ENCODING_PREFERENCE if coding in accepted and coding in snapshot.encodings), None)
+    # Strong validators must differ per content-coding, so compressed bodies get a suffixed tag
+    etag = f'{snapshot.etag[:-1]}-{coding}"' if coding else snapshot.etag
+    headers = {"ETag": etag, "Last-Modified": snapshot.last_modified, "Vary": "Accept-Encoding", "X-Cache-Version": version_token(snapshot.version)}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    since = parse_version_token(since)
+    if since is not None:
+        patches = snapshot_patches.setdefault(name, {})
+        body = patches.get(since)
+        if body is None:
+            patch = build_patch(name, snapshot, since)
+            if patch is not None:
+                body = patches[since] = encode_json(patch)
+        if body is not None:
+            # Patches depend on since, so they are not tagged with the snapshot's ETag
+            del headers["ETag"]
+            return Response(content=body, media_type="application/json", headers=headers)
+
+    if coding:
+        headers["Content-Encoding"] = coding
+        return Response(content=snapshot.encodings[coding], media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+# --- Live Update Streams ---
+
+class StreamSubscriber:
+    """A connected event-stream client with a bounded queue of pre-encoded events."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    def push(self, version: int, event: bytes) -> bool:
+        """Queue an event, returning False if the client has fallen too far behind."""
+        try:
+            self.queue.put_nowait((version, event))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self):
+        # Drop anything still queued so the closing sentinel always fits
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+stream_subscribers: Dict[str, Set[StreamSubscriber]] = {}
+
+def sse_event(event: str, version: int, data: bytes) -> bytes:
+    # encode_json never emits raw newlines, so the payload always fits on one data line
+    return b"event: " + event.encode() + b"\nid: " + version_token(version).encode() + b"\ndata: " + data + b"\n\n"
+
+async def broadcast_snapshot(name: str, snapshot: CacheSnapshot):
+    """Fan a new version out to every subscriber as a patch against the previous version."""
+    subscribers = stream_subscribers.get(name)
+    if not subscribers:
+        return
+    patches = snapshot_patches.setdefault(name, {})
+    body = patches.get(snapshot.version - 1)
+    if body is None:
+        patch = build_patch(name, snapshot, snapshot.version - 1)
+        body = patches[snapshot.version - 1] = await asyncio.to_thread(encode_json, patch)
+    event = sse_event("patch", snapshot.version, body)
+    for subscriber in list(subscribers):
+        if not subscriber.push(snapshot.version, event):
+            logger.info(f"Dropping slow {name} stream subscriber")
+            subscribers.discard(subscriber)
+            subscriber.close()
+
+streams_closing = False
+
+def close_streams():
+    """End every open event stream and refuse new ones; called when shutdown starts."""
+    global streams_closing
+    streams_closing = True
+    for subscribers in stream_subscribers.values():
+        for subscriber in subscribers:
+            subscriber.close()
+        subscribers.clear()
+
+def close_streams_on_exit_signals():
+    """Chain close_streams in front of the server's SIGINT/SIGTERM handlers.
+
+    uvicorn waits for in-flight responses to finish before it runs the shutdown event,
+    so open streams have to end as soon as the signal arrives, not in shutdown_event.
+    """
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(close_streams)
+            previous(signum, frame)
+
+        try:
+            signal.signal(sig, handler)
+        except ValueError:
+            # Not the main thread, e.g. under a test client; shutdown_event still closes the streams
+            return
+
+async def stream_events(name: str, last_event_id: Optional[str]):
+    """Yield a snapshot (or a catch-up patch after a reconnect) followed by live patches."""
+    if streams_closing:
+        return
+    subscriber = StreamSubscriber()
+    stream_subscribers.setdefault(name, set()).add(subscriber)
+    try:
+        snapshot = snapshots.get(name)
+        if snapshot:
+            since = parse_version_token(last_event_id)
+            patch = build_patch(name, snapshot, since) if since is not None else None
+            if patch is not None:
+                yield sse_event("patch", snapshot.version, encode_json(patch))
+            else:
+                yield sse_event("snapshot", snapshot.version, snapshot.body)
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), timeout=STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if item is None:
+                break
+            version, event = item
+            if snapshot is None:
+                # Subscribed while the source was warming up: the client has no base for a patch yet
+                snapshot = snapshots[name]
+                yield sse_event("snapshot", snapshot.version, snapshot.body)
+            # Versions published between subscribing and reading the snapshot are already covered by it
+            if version <= snapshot.version:
+                continue
+            yield event
+    finally:
+        stream_subscribers[name].discard(subscriber)
+
+def stream_response(request: Request, name: str) -> StreamingResponse:
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream_events(name, request.headers.get("last-event-id")), media_type="text/event-stream", headers=headers)
+
 # --- Cartographer Helper Functions ---
 
 def clean_string_field(s: Any) -> Any:
@@ -518,388 +1382,942 @@ def summarize_server(data: Dict[str, Any]) -> Dict[str, Any]:
     summary['decoded_properties'] = decoded
     return summary
 
-async def fetch_cartographer_server_details(client: httpx.AsyncClient, server_id: Any) -> Optional[Dict[str, Any]]:
-    """Fetch details for a single Cartographer server."""
+async def fetch_cartographer_server_details(client: httpx.AsyncClient, server_id: Any) -> Dict[str, Any]:
+    """Fetch details for a single Cartographer server, raising on transport, HTTP status and decode errors."""
     url = f"{CARTOGRAPHER_SERVER_URL}/{server_id}"
-    try:
+    with refresh_phase_seconds.time(source="cartographer", phase="probe", host=_url_host(url)):
         r = await client.get(url, timeout=15.0)
         r.raise_for_status()
+    with refresh_phase_seconds.time(source="cartographer", phase="summarize", host=""):
         return summarize_server(r.json())
-    except Exception as e:
-        logger.warning(f"Failed to fetch Cartographer server {server_id}: {e}")
-        return {'xuid': server_id, 'server_name': '', 'map_name': '', 'gametype': '', 'variant': '', 'description': '<failed>'}
+
+# --- Database Layer ---
+
+class Database:
+    """SQLite access off the event loop: one long-lived writer connection on its own thread plus read-only connections."""
+
+    def __init__(self, path: str, readers: int = DB_READERS):
+        self.path = path
+        self.writer = CountingThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.readers = CountingThreadPoolExecutor(max_workers=readers, thread_name_prefix="db-reader")
+        self.local = threading.local()
+        self.write_conn: Optional[sqlite3.Connection] = None
+        self.read_conns: List[sqlite3.Connection] = []
+
+    def _connect(self, uri: str) -> sqlite3.Connection:
+        # Connections live as long as the process, so sqlite3's statement cache keeps queries prepared
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=DB_CACHED_STATEMENTS)
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        return conn
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        if self.write_conn is None:
+            conn = self._connect(f"file:{self.path}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+            self.write_conn = conn
+        return self.write_conn
+
+    def _reader_connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # Make sure the database exists (and is in WAL mode) before opening it read-only
+            self.writer.submit(self._writer_connection).result()
+            conn = self.local.conn = self._connect(f"file:{self.path}?mode=ro")
+            self.read_conns.append(conn)
+        return conn
+
+    def _run_write(self, fn: Callable[..., Any], *args) -> Any:
+        conn = self._writer_connection()
+        with conn:
+            return fn(conn, *args)
+
+    def _run_read(self, fn: Callable[..., Any], *args) -> Any:
+        return fn(self._reader_connection(), *args)
+
+    async def write(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(conn, *args) in a transaction on the writer thread."""
+        return await asyncio.get_running_loop().run_in_executor(self.writer, self._run_write, fn, *args)
+
+    async def read(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(conn, *args) on a read-only connection from the reader pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.readers, self._run_read, fn, *args)
+
+    def close(self):
+        """Finish queued writes and close every connection."""
+        self.readers.shutdown(wait=True)
+        self.writer.shutdown(wait=True)
+        for conn in self.read_conns:
+            conn.close()
+        self.read_conns.clear()
+        if self.write_conn is not None:
+            self.write_conn.close()
+            self.write_conn = None
+
+db = Database(DB_PATH)
 
 # --- Database Functions ---
 
-async def fetch_legacy_eldewrito_stats() -> Optional[Dict[str, List[List[int]]]]:
-    """Fetch historical ElDewrito stats from legacy API."""
-    try:
-        async with httpx.AsyncClient() as client:
-            logger.info(f"Fetching legacy ElDewrito stats from {LEGACY_ELDEWRITO_STATS_URL}...")
-            response = await client.get(LEGACY_ELDEWRITO_STATS_URL, timeout=30.0)
-            response.raise_for_status()
-            data = response.json()
+class LegacyStatsParser:
+    """Incremental parser for the legacy {"players": [[ms, n], ...], "servers": [[ms, n], ...]} payload."""
 
-            if "players" in data and "servers" in data:
-                if isinstance(data["players"], list) and isinstance(data["servers"], list):
-                    logger.info(f"Successfully fetched {len(data['players'])} historical ElDewrito data points")
-                    return data
-            
-            logger.warning("Legacy stats API returned unexpected format")
-            return None
-    except Exception as e:
-        logger.warning(f"Failed to fetch legacy ElDewrito stats: {e}")
-        return None
+    TOKEN = re.compile(rb'"(players|servers)"\s*:|\[\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?|null)\s*\]')
 
-def populate_from_legacy_eldewrito_stats(legacy_data: Dict[str, List[List[int]]]):
-    """Populate ElDewrito database with legacy stats data."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+    def __init__(self):
+        self.buffer = b""
+        self.series: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> Dict[str, List[tuple]]:
+        """Consume a chunk and return the complete [timestamp, value] pairs it finished, by series."""
+        rows: Dict[str, List[tuple]] = {"players": [], "servers": []}
+        buffer = self.buffer + chunk
+        end = 0
+        for match in self.TOKEN.finditer(buffer):
+            end = match.end()
+            if match.group(1):
+                self.series = match.group(1).decode()
+            elif self.series:
+                value = match.group(3)
+                rows[self.series].append((int(float(match.group(2))), 0 if value == b"null" else int(float(value))))
+        # Keep whatever follows the last token, it may be the start of one split across chunks
+        self.buffer = buffer[end:] if end or len(buffer) < 4096 else buffer[-64:]
+        return rows
+
+    @property
+    def complete(self) -> bool:
+        """Whether the closing brace of the payload has been seen (a truncated body leaves this False)."""
+        return self.buffer.rstrip().endswith(b"}")
+
+def stage_legacy_eldewrito_stats(conn: sqlite3.Connection, rows: Dict[str, List[tuple]]):
+    """Upsert parsed legacy rows into the staging table, keyed by timestamp so re-runs are harmless."""
+    conn.executemany("""
+        INSERT INTO legacy_stats_staging (timestamp, player_count) VALUES (?, ?)
+        ON CONFLICT(timestamp) DO UPDATE SET player_count = excluded.player_count
+    """, rows["players"])
+    conn.executemany("""
+        INSERT INTO legacy_stats_staging (timestamp, server_count) VALUES (?, ?)
+        ON CONFLICT(timestamp) DO UPDATE SET server_count = excluded.server_count
+    """, rows["servers"])
+    conn.execute("""
+        INSERT INTO legacy_import (source, state, rows) VALUES ('eldewrito', 'staging', ?)
+        ON CONFLICT(source) DO UPDATE SET rows = rows + excluded.rows
+    """, (len(rows["players"]) + len(rows["servers"]),))
+
+def merge_legacy_eldewrito_stats(conn: sqlite3.Connection) -> int:
+    """Move staged legacy rows into server_stats in one transaction, rebuilding the index and adding them to the rollups."""
+    conn.execute("BEGIN")
+    conn.execute("DROP INDEX IF EXISTS idx_recorded_at")
+    # recorded_at uses the same text format Python's sqlite3 adapter writes for live samples
+    cursor = conn.execute("""
+        INSERT INTO server_stats (player_count, server_count, recorded_at)
+        SELECT
+            COALESCE(player_count, 0),
+            COALESCE(server_count, 0),
+            strftime('%Y-%m-%d %H:%M:%S', timestamp / 1000, 'unixepoch')
+                || CASE WHEN timestamp % 1000 THEN printf('.%06d', (timestamp % 1000) * 1000) ELSE '' END
+                || '+00:00'
+        FROM legacy_stats_staging
+        ORDER BY timestamp
+    """)
+    records_added = cursor.rowcount
+    conn.execute("CREATE INDEX idx_recorded_at ON server_stats(recorded_at)")
+    # Added to the existing buckets: rebuilding them from server_stats would lose compacted live samples
+    add_stats_rollups(conn, "server_stats", """
+        SELECT timestamp / 1000 AS ts, COALESCE(player_count, 0) AS players, COALESCE(server_count, 0) AS servers
+        FROM legacy_stats_staging
+    """)
+    conn.execute("DROP TABLE legacy_stats_staging")
+    conn.execute("UPDATE legacy_import SET state = 'done' WHERE source = 'eldewrito'")
+    return records_added
+
+async def import_legacy_eldewrito_stats(eldewrito_count: int):
+    """Stream the legacy ElDewrito stats into the database.
+
+    Rows are staged in chunked transactions and merged into server_stats at the end, with
+    progress kept in legacy_import: an interrupted import resumes on the next start (even if
+    live samples have been recorded since), and a finished one is never repeated.
+    """
+    def read_state(conn: sqlite3.Connection) -> Optional[str]:
+        row = conn.execute("SELECT state FROM legacy_import WHERE source = 'eldewrito'").fetchone()
+        return row[0] if row else None
+
+    state = await db.write(read_state)
+    if state == "done" or (state is None and eldewrito_count > 0):
+        return
 
-        players_dict = {entry[0]: entry[1] for entry in legacy_data.get("players", [])}
-        servers_dict = {entry[0]: entry[1] for entry in legacy_data.get("servers", [])}
-        
-        all_timestamps = set(players_dict.keys()) | set(servers_dict.keys())
-        
-        records_added = 0
-        for timestamp_ms in sorted(all_timestamps):
-            timestamp_dt = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
-            
-            player_count = players_dict.get(timestamp_ms, 0)
-            server_count = servers_dict.get(timestamp_ms, 0)
-            
-            cursor.execute("""
-                INSERT INTO server_stats (player_count, server_count, recorded_at)
-                VALUES (?, ?, ?)
-            """, (player_count, server_count, timestamp_dt))
-            
-            records_added += 1
-        
-        conn.commit()
-        conn.close()
-        
+    if state != "staged":
+        logger.info(f"Streaming legacy ElDewrito stats from {LEGACY_ELDEWRITO_STATS_URL}...")
+
+        def create_staging(conn: sqlite3.Connection):
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS legacy_stats_staging (
+                    timestamp INTEGER PRIMARY KEY,
+                    player_count INTEGER,
+                    server_count INTEGER
+                )
+            """)
+
+        await db.write(create_staging)
+        parser = LegacyStatsParser()
+        pending: Dict[str, List[tuple]] = {"players": [], "servers": []}
+        staged = 0
+        try:
+            client = get_http_client("eldewrito_api")
+            async with client.stream("GET", LEGACY_ELDEWRITO_STATS_URL, timeout=30.0) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    for series, rows in parser.feed(chunk).items():
+                        pending[series].extend(rows)
+                    if len(pending["players"]) + len(pending["servers"]) >= LEGACY_IMPORT_CHUNK_ROWS:
+                        await db.write(stage_legacy_eldewrito_stats, pending)
+                        staged += len(pending["players"]) + len(pending["servers"])
+                        pending = {"players": [], "servers": []}
+            await db.write(stage_legacy_eldewrito_stats, pending)
+            staged += len(pending["players"]) + len(pending["servers"])
+            if staged and not parser.complete:
+                raise ValueError("legacy stats payload was truncated")
+        except Exception as e:
+            logger.warning(f"Failed to fetch legacy ElDewrito stats: {e}")
+            return
+
+        if not staged:
+            logger.info("No legacy data available, starting with empty ElDewrito stats database")
+            return
+
+        def mark_staged(conn: sqlite3.Connection):
+            conn.execute("UPDATE legacy_import SET state = 'staged' WHERE source = 'eldewrito'")
+
+        await db.write(mark_staged)
+        logger.info(f"Staged {staged} legacy ElDewrito data points")
+
+    try:
+        records_added = await db.write(merge_legacy_eldewrito_stats)
         logger.info(f"Successfully populated ElDewrito database with {records_added} historical records")
     except Exception as e:
         logger.error(f"Failed to populate ElDewrito stats from legacy data: {e}")
 
 async def init_db():
-    """Initialize the stats tables and populate ElDewrito stats with legacy data if empty."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # ElDewrito stats table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS server_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player_count INTEGER NOT NULL DEFAULT 0,
-            server_count INTEGER NOT NULL DEFAULT 0,
-            recorded_at TIMESTAMP NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_recorded_at 
-        ON server_stats(recorded_at)
-    """)
-    
-    # Cartographer stats table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cartographer_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player_count INTEGER NOT NULL DEFAULT 0,
-            server_count INTEGER NOT NULL DEFAULT 0,
-            recorded_at TIMESTAMP NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_cartographer_recorded_at 
-        ON cartographer_stats(recorded_at)
-    """)
+    """Initialize the stats tables and import legacy ElDewrito stats if that has not been done yet."""
+    def create_tables(conn: sqlite3.Connection) -> int:
+        cursor = conn.cursor()
 
-    # Halo CE stats table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS haloce_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player_count INTEGER NOT NULL DEFAULT 0,
-            server_count INTEGER NOT NULL DEFAULT 0,
-            recorded_at TIMESTAMP NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        # One stats table per source
+        for source in sources.values():
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {source.stats_table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    player_count INTEGER NOT NULL DEFAULT 0,
+                    server_count INTEGER NOT NULL DEFAULT 0,
+                    recorded_at TIMESTAMP NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS {source.stats_index} 
+                ON {source.stats_table}(recorded_at)
+            """)
+
+        # Hourly/daily rollups of every stats table, maintained as samples are saved
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats_rollups (
+                source TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                players_min INTEGER NOT NULL,
+                players_max INTEGER NOT NULL,
+                players_sum INTEGER NOT NULL,
+                servers_min INTEGER NOT NULL,
+                servers_max INTEGER NOT NULL,
+                servers_sum INTEGER NOT NULL,
+                PRIMARY KEY (source, resolution, bucket)
+            ) WITHOUT ROWID
+        """)
 
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_halo_ce_recorded_at 
-        ON haloce_stats(recorded_at)
-    """)
+        ServerHistoryStore.create_tables(cursor)
+        ServerRegistry.create_tables(cursor)
 
-    # Halo PC stats table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS halopc_stats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            player_count INTEGER NOT NULL DEFAULT 0,
-            server_count INTEGER NOT NULL DEFAULT 0,
-            recorded_at TIMESTAMP NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        # Progress of the one-off legacy ElDewrito import
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS legacy_import (
+                source TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                rows INTEGER NOT NULL DEFAULT 0
+            )
+        """)
 
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_halo_pc_recorded_at 
-        ON halopc_stats(recorded_at)
-    """)
+        # Only check ElDewrito stats for legacy data population
+        cursor.execute("SELECT COUNT(*) FROM server_stats")
+        return cursor.fetchone()[0]
 
-    # Only check ElDewrito stats for legacy data population
-    cursor.execute("SELECT COUNT(*) FROM server_stats")
-    eldewrito_count = cursor.fetchone()[0]
-    
-    conn.commit()
-    conn.close()
+    eldewrito_count = await db.write(create_tables)
     
     logger.info("Database initialized")
 
     # Only populate legacy data for ElDewrito stats table
-    if eldewrito_count == 0:
-        logger.info("ElDewrito stats table is empty, attempting to fetch legacy data...")
-        legacy_data = await fetch_legacy_eldewrito_stats()
-        
-        if legacy_data and (legacy_data.get("players") or legacy_data.get("servers")):
-            populate_from_legacy_eldewrito_stats(legacy_data)
-        else:
-            logger.info("No legacy data available, starting with empty ElDewrito stats database")
+    await import_legacy_eldewrito_stats(eldewrito_count)
 
-def save_eldewrito_stats(player_count: int, server_count: int):
-    """Save current ElDewrito stats to database."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now(timezone.utc)
-        
-        cursor.execute("""
-            INSERT INTO server_stats (player_count, server_count, recorded_at)
-            VALUES (?, ?, ?)
-        """, (player_count, server_count, now))
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"Saved ElDewrito stats: {server_count} servers, {player_count} players")
-    except Exception as e:
-        logger.error(f"Failed to save ElDewrito stats: {e}")
+    # Build rollups for tables that have raw rows but no rollups yet (first run, or after the legacy import)
+    def backfill_rollups(conn: sqlite3.Connection):
+        for table in (source.stats_table for source in sources.values()):
+            has_rows = conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+            has_rollups = conn.execute("SELECT 1 FROM stats_rollups WHERE source = ? LIMIT 1", (table,)).fetchone()
+            if has_rows and not has_rollups:
+                rebuild_stats_rollups(conn, table)
+                logger.info(f"Built stats rollups for {table}")
 
-def save_cartographer_stats(player_count: int, server_count: int):
-    """Save current Cartographer stats to database."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now(timezone.utc)
-        
-        cursor.execute("""
-            INSERT INTO cartographer_stats (player_count, server_count, recorded_at)
-            VALUES (?, ?, ?)
-        """, (player_count, server_count, now))
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"Saved Cartographer stats: {server_count} servers, {player_count} players")
-    except Exception as e:
-        logger.error(f"Failed to save Cartographer stats: {e}")
+    await db.write(backfill_rollups)
 
-def save_haloce_stats(player_count: int, server_count: int):
-    """Save current Halo CE stats to database."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now(timezone.utc)
-        
-        cursor.execute("""
-            INSERT INTO haloce_stats (player_count, server_count, recorded_at)
+async def save_stats(table: str, label: str, player_count: int, server_count: int):
+    """Save current stats to a stats table and the matching in-memory series."""
+    now = datetime.now(timezone.utc)
+
+    timestamp = int(now.timestamp())
+
+    def insert(conn: sqlite3.Connection):
+        conn.execute(f"""
+            INSERT INTO {table} (player_count, server_count, recorded_at)
             VALUES (?, ?, ?)
         """, (player_count, server_count, now))
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"Saved Halo CE stats: {server_count} servers, {player_count} players")
-    except Exception as e:
-        logger.error(f"Failed to save Halo CE stats: {e}")
+        upsert_stats_rollups(conn, table, timestamp, player_count, server_count)
 
-def save_halopc_stats(player_count: int, server_count: int):
-    """Save current Halo PC stats to database."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now(timezone.utc)
-        
-        cursor.execute("""
-            INSERT INTO halopc_stats (player_count, server_count, recorded_at)
-            VALUES (?, ?, ?)
-        """, (player_count, server_count, now))
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"Saved Halo PC stats: {server_count} servers, {player_count} players")
+        await db.write(insert)
+        if table in stats_series:
+            stats_series[table].append(timestamp * 1000, player_count, server_count)
+        for rollup in stats_rollups.get(table, {}).values():
+            rollup.add(timestamp * 1000, player_count, server_count)
+        logger.info(f"Saved {label} stats: {server_count} servers, {player_count} players")
     except Exception as e:
-        logger.error(f"Failed to save Halo PC stats: {e}")
+        logger.error(f"Failed to save {label} stats: {e}")
+
+    if time.monotonic() - stats_compacted_at.get(table, 0) >= STATS_COMPACTION_INTERVAL:
+        await compact_stats(table, label)
+
+def lttb(data: List[List[int]], threshold: int) -> List[List[int]]:
+    """Downsample [timestamp, value] points to threshold points with Largest-Triangle-Three-Buckets."""
+    if threshold >= len(data) or threshold < 3:
+        return data
+
+    sampled = [data[0]]
+    bucket_size = (len(data) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, len(data))
+        count = next_end - next_start
+        avg_x = sum(p[0] for p in data[next_start:next_end]) / count
+        avg_y = sum(p[1] for p in data[next_start:next_end]) / count
+
+        ax, ay = data[a]
+        best_area, best = -1.0, None
+        for j in range(int(i * bucket_size) + 1, int((i + 1) * bucket_size) + 1):
+            bx, by = data[j]
+            area = abs((ax - avg_x) * (by - ay) - (ax - bx) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        sampled.append(data[best])
+        a = best
+    sampled.append(data[-1])
+    return sampled
+
+class StatsSeries:
+    """In-memory stats history for one game, held in compact typed arrays sorted by timestamp."""
 
-def get_eldewrito_stats_history() -> Dict[str, List[List[int]]]:
-    """Retrieve historical ElDewrito stats from database."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                CAST(strftime('%s', recorded_at) AS INTEGER) * 1000 as timestamp,
-                player_count,
-                server_count
-            FROM server_stats
-            ORDER BY recorded_at ASC
-        """)
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        players = [[row[0], row[1]] for row in rows]
-        servers = [[row[0], row[2]] for row in rows]
-        
+    def __init__(self):
+        self.timestamps = array('q')
+        self.players = array('l')
+        self.servers = array('l')
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: int, player_count: int, server_count: int):
+        if self.timestamps and timestamp < self.timestamps[-1]:
+            # Keep the arrays sorted if a sample ever arrives out of order
+            i = bisect.bisect_right(self.timestamps, timestamp)
+            self.timestamps.insert(i, timestamp)
+            self.players.insert(i, player_count)
+            self.servers.insert(i, server_count)
+            return
+        self.timestamps.append(timestamp)
+        self.players.append(player_count)
+        self.servers.append(server_count)
+
+    def trim(self, before: int):
+        """Drop samples older than before (ms timestamp)."""
+        i = bisect.bisect_left(self.timestamps, before)
+        del self.timestamps[:i]
+        del self.players[:i]
+        del self.servers[:i]
+
+    def count(self, start: Optional[int] = None, end: Optional[int] = None) -> int:
+        lo = bisect.bisect_left(self.timestamps, start) if start is not None else 0
+        hi = bisect.bisect_right(self.timestamps, end) if end is not None else len(self.timestamps)
+        return max(0, hi - lo)
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None, points: Optional[int] = None) -> Dict[str, List[List[int]]]:
+        lo = bisect.bisect_left(self.timestamps, start) if start is not None else 0
+        hi = bisect.bisect_right(self.timestamps, end) if end is not None else len(self.timestamps)
+        timestamps = self.timestamps[lo:hi]
+        players = [[t, v] for t, v in zip(timestamps, self.players[lo:hi])]
+        servers = [[t, v] for t, v in zip(timestamps, self.servers[lo:hi])]
+        if points:
+            players = lttb(players, points)
+            servers = lttb(servers, points)
         return {
             "players": players,
             "servers": servers
         }
-    except Exception as e:
-        logger.error(f"Failed to retrieve ElDewrito stats: {e}")
-        return {
-            "players": [],
-            "servers": []
-        }
 
-def get_cartographer_stats_history() -> Dict[str, List[List[int]]]:
-    """Retrieve historical Cartographer stats from database."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                CAST(strftime('%s', recorded_at) AS INTEGER) * 1000 as timestamp,
-                player_count,
-                server_count
-            FROM cartographer_stats
-            ORDER BY recorded_at ASC
-        """)
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        players = [[row[0], row[1]] for row in rows]
-        servers = [[row[0], row[2]] for row in rows]
-        
+class RollupSeries(StatsSeries):
+    """Stats averaged into fixed buckets; timestamps are bucket starts and values running sums."""
+
+    def __init__(self, resolution: int):
+        super().__init__()
+        self.resolution = resolution
+        self.samples = array('l')
+
+    def add(self, timestamp: int, player_count: int, server_count: int, samples: int = 1):
+        bucket = timestamp - timestamp % (self.resolution * 1000)
+        i = bisect.bisect_left(self.timestamps, bucket)
+        if i < len(self.timestamps) and self.timestamps[i] == bucket:
+            self.players[i] += player_count
+            self.servers[i] += server_count
+            self.samples[i] += samples
+            return
+        self.timestamps.insert(i, bucket)
+        self.players.insert(i, player_count)
+        self.servers.insert(i, server_count)
+        self.samples.insert(i, samples)
+
+    def trim(self, before: int):
+        i = bisect.bisect_left(self.timestamps, before)
+        super().trim(before)
+        del self.samples[:i]
+
+    def query(self, start: Optional[int] = None, end: Optional[int] = None, points: Optional[int] = None) -> Dict[str, List[List[int]]]:
+        lo = bisect.bisect_left(self.timestamps, start) if start is not None else 0
+        hi = bisect.bisect_right(self.timestamps, end) if end is not None else len(self.timestamps)
+        rows = list(zip(self.timestamps[lo:hi], self.samples[lo:hi], self.players[lo:hi], self.servers[lo:hi]))
+        players = [[t, round(p / n)] for t, n, p, _ in rows]
+        servers = [[t, round(s / n)] for t, n, _, s in rows]
+        if points:
+            players = lttb(players, points)
+            servers = lttb(servers, points)
         return {
             "players": players,
             "servers": servers
         }
-    except Exception as e:
-        logger.error(f"Failed to retrieve Cartographer stats: {e}")
-        return {
-            "players": [],
-            "servers": []
-        }
 
-def get_haloce_stats_history() -> Dict[str, List[List[int]]]:
-    """Retrieve historical Halo CE stats from database."""
+stats_series: Dict[str, StatsSeries] = {}
+stats_rollups: Dict[str, Dict[int, RollupSeries]] = {}
+stats_compacted_at: Dict[str, float] = {}
+
+def upsert_stats_rollups(conn: sqlite3.Connection, table: str, timestamp: int, player_count: int, server_count: int):
+    """Fold one raw sample (unix seconds) into the hourly and daily rollups."""
+    conn.executemany("""
+        INSERT INTO stats_rollups (source, resolution, bucket, samples, players_min, players_max, players_sum, servers_min, servers_max, servers_sum)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source, resolution, bucket) DO UPDATE SET
+            samples = samples + 1,
+            players_min = MIN(players_min, excluded.players_min),
+            players_max = MAX(players_max, excluded.players_max),
+            players_sum = players_sum + excluded.players_sum,
+            servers_min = MIN(servers_min, excluded.servers_min),
+            servers_max = MAX(servers_max, excluded.servers_max),
+            servers_sum = servers_sum + excluded.servers_sum
+    """, [(table, resolution, timestamp - timestamp % resolution, player_count, player_count, player_count, server_count, server_count, server_count)
+          for resolution in STATS_ROLLUP_RESOLUTIONS])
+
+def add_stats_rollups(conn: sqlite3.Connection, table: str, samples: str):
+    """Fold the (ts unix seconds, players, servers) rows of a query into a table's rollups, adding to existing buckets."""
+    for resolution in STATS_ROLLUP_RESOLUTIONS:
+        conn.execute(f"""
+            INSERT INTO stats_rollups (source, resolution, bucket, samples, players_min, players_max, players_sum, servers_min, servers_max, servers_sum)
+            SELECT ?, ?, (ts / ?) * ? AS bucket, COUNT(*), MIN(players), MAX(players), SUM(players), MIN(servers), MAX(servers), SUM(servers)
+            FROM ({samples})
+            WHERE true
+            GROUP BY bucket
+            ON CONFLICT(source, resolution, bucket) DO UPDATE SET
+                samples = samples + excluded.samples,
+                players_min = MIN(players_min, excluded.players_min),
+                players_max = MAX(players_max, excluded.players_max),
+                players_sum = players_sum + excluded.players_sum,
+                servers_min = MIN(servers_min, excluded.servers_min),
+                servers_max = MAX(servers_max, excluded.servers_max),
+                servers_sum = servers_sum + excluded.servers_sum
+        """, (table, resolution, resolution, resolution))
+
+def rebuild_stats_rollups(conn: sqlite3.Connection, table: str):
+    """Recompute a table's rollups from its raw rows."""
+    conn.execute("DELETE FROM stats_rollups WHERE source = ?", (table,))
+    for resolution in STATS_ROLLUP_RESOLUTIONS:
+        conn.execute(f"""
+            INSERT INTO stats_rollups (source, resolution, bucket, samples, players_min, players_max, players_sum, servers_min, servers_max, servers_sum)
+            SELECT ?, ?, (CAST(strftime('%s', recorded_at) AS INTEGER) / ?) * ? AS bucket, COUNT(*),
+                   MIN(player_count), MAX(player_count), SUM(player_count),
+                   MIN(server_count), MAX(server_count), SUM(server_count)
+            FROM {table}
+            GROUP BY bucket
+        """, (table, resolution, resolution, resolution))
+
+async def compact_stats(table: str, label: str):
+    """Delete raw samples older than the retention period; the rollups keep their history."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=STATS_RAW_RETENTION_DAYS)
+    stats_compacted_at[table] = time.monotonic()
+
+    def delete(conn: sqlite3.Connection) -> int:
+        return conn.execute(f"DELETE FROM {table} WHERE recorded_at < ?", (cutoff,)).rowcount
+
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        deleted = await db.write(delete)
+        if table in stats_series:
+            stats_series[table].trim(int(cutoff.timestamp()) * 1000)
+        if deleted:
+            logger.info(f"Compacted {deleted} {label} stats records older than {STATS_RAW_RETENTION_DAYS} days")
+    except Exception as e:
+        logger.error(f"Failed to compact {label} stats: {e}")
+
+async def load_stats_series(table: str, label: str) -> StatsSeries:
+    """Load a stats table and its rollups into memory; history requests are served from the result."""
+    def read(conn: sqlite3.Connection) -> tuple:
+        series = StatsSeries()
+        cursor = conn.execute(f"""
             SELECT 
                 CAST(strftime('%s', recorded_at) AS INTEGER) * 1000 as timestamp,
                 player_count,
                 server_count
-            FROM haloce_stats
+            FROM {table}
             ORDER BY recorded_at ASC
         """)
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        players = [[row[0], row[1]] for row in rows]
-        servers = [[row[0], row[2]] for row in rows]
-        
-        return {
-            "players": players,
-            "servers": servers
-        }
+        for timestamp, player_count, server_count in cursor:
+            series.append(timestamp, player_count, server_count)
+
+        rollups = {resolution: RollupSeries(resolution) for resolution in STATS_ROLLUP_RESOLUTIONS}
+        cursor = conn.execute("""
+            SELECT resolution, bucket * 1000, samples, players_sum, servers_sum
+            FROM stats_rollups
+            WHERE source = ?
+            ORDER BY resolution, bucket
+        """, (table,))
+        for resolution, bucket, samples, players_sum, servers_sum in cursor:
+            if resolution in rollups:
+                rollups[resolution].add(bucket, players_sum, servers_sum, samples)
+        return series, rollups
+
+    try:
+        series, rollups = await db.read(read)
+        logger.info(f"Loaded {len(series)} {label} stats records into memory")
     except Exception as e:
-        logger.error(f"Failed to retrieve Halo CE stats: {e}")
-        return {
-            "players": [],
-            "servers": []
-        }
+        logger.error(f"Failed to load {label} stats: {e}")
+        series, rollups = StatsSeries(), {resolution: RollupSeries(resolution) for resolution in STATS_ROLLUP_RESOLUTIONS}
+    stats_series[table] = series
+    stats_rollups[table] = rollups
+    await compact_stats(table, label)
+    return series
+
+def get_stats_history(table: str, label: str, start: Optional[int] = None, end: Optional[int] = None, points: Optional[int] = None) -> Dict[str, List[List[int]]]:
+    """Retrieve historical stats for a table, limited to [start, end] (ms timestamps) and downsampled to points.
+
+    Raw samples are used while they cover the range; otherwise (or when a coarser rollup
+    still has enough buckets for the requested points) the coarsest suitable rollup is used.
+    """
+    series = stats_series.get(table)
+    if series is None:
+        logger.warning(f"{label} stats requested before they were loaded")
+        return {"players": [], "servers": []}
+
+    rollups = [stats_rollups.get(table, {}).get(resolution) for resolution in STATS_ROLLUP_RESOLUTIONS]
+    rollups = [rollup for rollup in rollups if rollup is not None and len(rollup)]
+    # Nothing older than the finest rollup's first bucket was ever recorded, so a range starting
+    # before it is covered by whatever covers the rollup's start
+    earliest = rollups[0].timestamps[0] if rollups else None
+    if start is not None:
+        earliest = max(start, earliest) if earliest is not None else start
+
+    # Raw rows only cover the range if nothing older than them has been compacted away,
+    # i.e. they start within the first bucket of the finest rollup
+    raw_covers = len(series) and (earliest is None or earliest >= series.timestamps[0] - STATS_ROLLUP_RESOLUTIONS[0] * 1000)
+    candidates = ([series] if raw_covers else []) + rollups
+    if not candidates:
+        return series.query(start, end, points)
+
+    chosen = candidates[0]
+    if points:
+        for candidate in candidates[1:]:
+            if candidate.count(start, end) >= points:
+                chosen = candidate
+    return chosen.query(start, end, points)
+
+# --- Server Registry ---
 
-def get_halopc_stats_history() -> Dict[str, List[List[int]]]:
-    """Retrieve historical Halo PC stats from database."""
+@dataclass
+class RegistryEntry:
+    first_seen: float
+    last_seen: Optional[float] = None
+    failures: int = 0
+    next_poll: float = 0.0  # when the server is next due for a probe, only tracked in memory
+
+class ServerRegistry:
+    """Every server each source has listed, with first/last successful contact and consecutive failures.
+
+    Kept in memory for the pollers and written back to SQLite in one batch per refresh cycle.
+    Each server also gets its own probe schedule: populated servers every refresh, empty ones
+    every POLL_IDLE_INTERVAL, failing ones with exponential backoff and long-dead ones every
+    SERVER_DEAD_RECHECK. Servers that are not due keep their last listing.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, RegistryEntry]] = {}
+        self.dirty: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def create_tables(cursor: sqlite3.Cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS server_registry (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER,
+                failures INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (source, key)
+            ) WITHOUT ROWID
+        """)
+
+    async def load(self):
+        def read(conn: sqlite3.Connection) -> List[tuple]:
+            return conn.execute("SELECT source, key, first_seen, last_seen, failures FROM server_registry").fetchall()
+
+        try:
+            rows = await db.read(read)
+        except Exception as e:
+            logger.error(f"Failed to load server registry: {e}")
+            return
+        for source, key, first_seen, last_seen, failures in rows:
+            self.entries.setdefault(source, {})[key] = RegistryEntry(first_seen, last_seen, failures)
+        logger.info(f"Loaded {len(rows)} servers into the registry")
+
+    def get(self, source: str, key: str) -> Optional[RegistryEntry]:
+        return self.entries.get(source, {}).get(key)
+
+    def first_seen(self, source: str, key: str) -> Optional[float]:
+        entry = self.get(source, key)
+        return entry.first_seen if entry else None
+
+    def is_due(self, source: str, key: str, now: Optional[float] = None) -> bool:
+        """Whether a server should be probed this refresh; unknown servers always are."""
+        entry = self.get(source, key)
+        # Half a refresh of slack so a server due just after this tick isn't pushed a whole cycle later
+        return entry is None or entry.next_poll <= (now or time.time()) + REFRESH_INTERVAL / 2
+
+    @staticmethod
+    def poll_interval(entry: RegistryEntry, players: int, now: float) -> float:
+        if not entry.failures:
+            return POLL_POPULATED_INTERVAL if players else POLL_IDLE_INTERVAL
+        if now - (entry.last_seen or entry.first_seen) >= SERVER_DEAD_AFTER:
+            return SERVER_DEAD_RECHECK
+        return min(REFRESH_INTERVAL * 2 ** (entry.failures - 1), POLL_BACKOFF_MAX)
+
+    def observe(self, source: str, seen: Optional[Dict[str, int]] = None, failed: Iterable[str] = ()):
+        """Record one cycle's outcome and schedule each server's next probe.
+
+        seen maps the servers that answered to their player count; failed lists those that were
+        probed but did not answer.
+        """
+        now = time.time()
+        entries = self.entries.setdefault(source, {})
+        dirty = self.dirty.setdefault(source, set())
+        for key, players in (seen or {}).items():
+            entry = entries.get(key)
+            if entry is None:
+                entry = entries[key] = RegistryEntry(now)
+            entry.last_seen = now
+            entry.failures = 0
+            entry.next_poll = now + self.poll_interval(entry, players, now)
+            dirty.add(key)
+        for key in failed:
+            entry = entries.get(key)
+            if entry is None:
+                entry = entries[key] = RegistryEntry(now)
+            entry.failures += 1
+            entry.next_poll = now + self.poll_interval(entry, 0, now)
+            dirty.add(key)
+
+    async def flush(self, source: str):
+        """Write the entries changed since the last flush in a single executemany."""
+        keys = self.dirty.pop(source, set())
+        if not keys:
+            return
+        entries = self.entries[source]
+        rows = [(source, key, int(entries[key].first_seen), int(entries[key].last_seen) if entries[key].last_seen else None, entries[key].failures)
+                for key in keys]
+
+        def write(conn: sqlite3.Connection):
+            conn.executemany("""
+                INSERT INTO server_registry (source, key, first_seen, last_seen, failures) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(source, key) DO UPDATE SET last_seen = excluded.last_seen, failures = excluded.failures
+            """, rows)
+
+        try:
+            with refresh_phase_seconds.time(source=source, phase="db_write", host=""):
+                await db.write(write)
+        except Exception as e:
+            self.dirty.setdefault(source, set()).update(keys)
+            logger.error(f"Failed to save {source} server registry: {e}")
+
+    async def update(self, source: str, seen: Optional[Dict[str, int]] = None, failed: Iterable[str] = ()):
+        self.observe(source, seen, failed)
+        await self.flush(source)
+
+server_registry = ServerRegistry()
+
+# --- Per-server History ---
+
+def _history_int(value: Any) -> int:
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+class ServerHistoryStore:
+    """Per-server player/map/gametype samples.
+
+    Rows are (server id, unix seconds, players, map id, gametype id) in a WITHOUT ROWID table whose
+    primary key doubles as the (server, time) index. Server keys and map/gametype names are
+    interned into dictionary tables, so a sample is a handful of small integers. The id maps are
+    only touched on the database writer thread.
+    """
+
+    def __init__(self):
+        self.server_ids: Dict[tuple, int] = {}
+        self.label_ids: Dict[str, int] = {}
+
+    @staticmethod
+    def create_tables(cursor: sqlite3.Cursor):
         cursor.execute("""
-            SELECT 
-                CAST(strftime('%s', recorded_at) AS INTEGER) * 1000 as timestamp,
-                player_count,
-                server_count
-            FROM halopc_stats
-            ORDER BY recorded_at ASC
+            CREATE TABLE IF NOT EXISTS history_servers (
+                id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                UNIQUE (source, key)
+            )
         """)
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        players = [[row[0], row[1]] for row in rows]
-        servers = [[row[0], row[2]] for row in rows]
-        
-        return {
-            "players": players,
-            "servers": servers
-        }
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS history_labels (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS server_history (
+                server_id INTEGER NOT NULL,
+                recorded_at INTEGER NOT NULL,
+                players INTEGER NOT NULL,
+                map_id INTEGER,
+                gametype_id INTEGER,
+                PRIMARY KEY (server_id, recorded_at)
+            ) WITHOUT ROWID
+        """)
+
+    def forget_ids(self, conn: sqlite3.Connection):
+        """Drop the cached id maps after a failed write; ids interned in a rolled back transaction no longer exist."""
+        self.server_ids.clear()
+        self.label_ids.clear()
+
+    def _intern_servers(self, conn: sqlite3.Connection, source: str, keys: Set[str]):
+        missing = [(source, key) for key in keys if (source, key) not in self.server_ids]
+        if missing:
+            conn.executemany("INSERT OR IGNORE INTO history_servers (source, key) VALUES (?, ?)", missing)
+            for start in range(0, len(missing), 500):
+                batch = [key for _, key in missing[start:start + 500]]
+                cursor = conn.execute(f"SELECT key, id FROM history_servers WHERE source = ? AND key IN ({','.join('?' * len(batch))})", (source, *batch))
+                for key, server_id in cursor:
+                    self.server_ids[(source, key)] = server_id
+
+    def _intern_labels(self, conn: sqlite3.Connection, names: Set[str]):
+        missing = [name for name in names if name not in self.label_ids]
+        if missing:
+            conn.executemany("INSERT OR IGNORE INTO history_labels (name) VALUES (?)", [(name,) for name in missing])
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                cursor = conn.execute(f"SELECT name, id FROM history_labels WHERE name IN ({','.join('?' * len(batch))})", batch)
+                for name, label_id in cursor:
+                    self.label_ids[name] = label_id
+
+    def record(self, conn: sqlite3.Connection, source: str, timestamp: int, rows: List[tuple]) -> int:
+        """Insert one cycle of (key, players, map, gametype) rows in a single executemany."""
+        self._intern_servers(conn, source, {row[0] for row in rows})
+        self._intern_labels(conn, {str(name) for row in rows for name in row[2:] if name})
+        label_ids = self.label_ids
+        conn.executemany("INSERT OR REPLACE INTO server_history VALUES (?, ?, ?, ?, ?)", [
+            (self.server_ids[(source, key)], timestamp, players,
+             label_ids[str(map_name)] if map_name else None, label_ids[str(gametype)] if gametype else None)
+            for key, players, map_name, gametype in rows
+        ])
+        return len(rows)
+
+    @staticmethod
+    def history(conn: sqlite3.Connection, source: str, key: str, start: Optional[int], end: Optional[int]) -> Optional[List[tuple]]:
+        """Return (ms timestamp, players, map, gametype) rows for one server, or None if it was never recorded."""
+        row = conn.execute("SELECT id FROM history_servers WHERE source = ? AND key = ?", (source, key)).fetchone()
+        if row is None:
+            return None
+        cursor = conn.execute("""
+            SELECT h.recorded_at * 1000, h.players, m.name, g.name
+            FROM server_history h
+            LEFT JOIN history_labels m ON m.id = h.map_id
+            LEFT JOIN history_labels g ON g.id = h.gametype_id
+            WHERE h.server_id = ? AND h.recorded_at BETWEEN ? AND ?
+            ORDER BY h.recorded_at
+        """, (row[0], (start or 0) // 1000, (end // 1000) if end is not None else 2 ** 62))
+        return cursor.fetchall()
+
+    @staticmethod
+    def compact(conn: sqlite3.Connection, before: int) -> int:
+        return conn.execute("DELETE FROM server_history WHERE recorded_at < ?", (before,)).rowcount
+
+server_history = ServerHistoryStore()
+
+server_history_compacted_at = 0.0
+
+async def save_server_history(source: "Source", data: Dict[str, Any]):
+    """Record every listed server of a source for this stats interval."""
+    global server_history_compacted_at
+    if not data.get("servers"):
+        return
+    try:
+        count = await db.write(server_history.record, source.name, int(time.time()), source.history_rows(data))
+        logger.debug(f"Saved history for {count} {source.label} servers")
     except Exception as e:
-        logger.error(f"Failed to retrieve Halo PC stats: {e}")
-        return {
-            "players": [],
-            "servers": []
-        }
+        logger.error(f"Failed to save {source.label} server history: {e}")
+        # Reloaded from history_servers/history_labels on the next successful write
+        await db.write(server_history.forget_ids)
 
-async def update_eldewrito_cache():
-    """Main logic: Pulls master lists, dedupes, queries servers, updates cache."""
-    global eldewrito_cache
-    
-    # 1. Load Master Server URLs from local JSON
+    if time.monotonic() - server_history_compacted_at >= STATS_COMPACTION_INTERVAL:
+        server_history_compacted_at = time.monotonic()
+        try:
+            deleted = await db.write(server_history.compact, int(time.time()) - SERVER_HISTORY_RETENTION_DAYS * 86400)
+            if deleted:
+                logger.info(f"Compacted {deleted} server history samples older than {SERVER_HISTORY_RETENTION_DAYS} days")
+        except Exception as e:
+            logger.error(f"Failed to compact server history: {e}")
+
+def _changes(rows: List[tuple], column: int) -> List[list]:
+    changes = []
+    for row in rows:
+        if not changes or changes[-1][1] != row[column]:
+            changes.append([row[0], row[column]])
+    return changes
+
+async def server_history_response(source: str, key: str, start: Optional[int], end: Optional[int], points: Optional[int]):
+    """Player counts for one server, plus the map and gametype each time they changed."""
     try:
-        async with await anyio.open_file(ELDEWRITO_MASTER_LIST, 'r') as f:
-            data = await f.read()
-            config = json.loads(data)
-            master_entries = config.get("masterServers", [])
-            # Extract only the 'list' attribute
-            master_urls = [m['list'] for m in master_entries if 'list' in m]
+        rows = await db.read(ServerHistoryStore.history, source, key, start, end)
     except Exception as e:
-        logger.error(f"Error reading {ELDEWRITO_MASTER_LIST}: {e}")
-        return
+        logger.error(f"Failed to read {source} server history for {key}: {e}")
+        return JSONResponse(status_code=503, content={"error": "Failed to read server history"})
+    if rows is None:
+        return JSONResponse(status_code=404, content={"error": "Server not found"})
+    players = [[t, n] for t, n, _, _ in rows]
+    if points:
+        players = lttb(players, points)
+    return {
+        "server": key,
+        "players": players,
+        "maps": _changes(rows, 2),
+        "gametypes": _changes(rows, 3)
+    }
+
+# --- Sources ---
+
+class Source(ABC):
+    """One game's server list: how it is refreshed, published and recorded.
+
+    Subclasses set the class attributes and implement refresh() and history_rows(); registering an
+    instance with register_source() gives it a stats table, background jobs and API routes.
+    """
+
+    name: str = ""                  # snapshot, registry and history key
+    label: str = ""                 # human-readable name for logs and errors
+    stats_table: str = ""
+    stats_index: str = ""
+    route_prefix: str = ""          # /stream, /stats and /server/{id}/history live under this
+    list_path: Optional[str] = None  # defaults to route_prefix
+    refresh_interval: float = REFRESH_INTERVAL
+    stats_interval: float = STATS_INTERVAL
 
-    async with httpx.AsyncClient() as client:
+    def __init__(self):
+        self.cache: Dict[str, Any] = {}
+        self.published_at: Optional[float] = None
+
+    @abstractmethod
+    async def refresh(self):
+        """Fetch the server list and publish() it."""
+
+    async def run_refresh(self):
+        """Refresh once, recording its duration and whether it published a new cache."""
+        published_at = self.published_at
+        try:
+            with refresh_seconds.time(source=self.name):
+                await self.refresh()
+        except Exception:
+            refresh_total.inc(source=self.name, result="error")
+            raise
+        refresh_total.inc(source=self.name, result="ok" if self.published_at != published_at else "failed")
+
+    @abstractmethod
+    def history_rows(self, data: Dict[str, Any]) -> List[tuple]:
+        """(key, players, map, gametype) for every server in a published cache."""
+
+    async def publish(self, data: Dict[str, Any]):
+        # Atomically update the cache, then the encoded snapshot served by the API
+        self.cache = data
+        with refresh_phase_seconds.time(source=self.name, phase="publish", host=""):
+            await publish_snapshot(self.name, data)
+        self.published_at = time.time()
+
+    async def record_stats(self):
+        if self.cache and "count" in self.cache:
+            player_count = self.cache["count"].get("players", 0)
+            server_count = self.cache["count"].get("servers", 0)
+            with refresh_phase_seconds.time(source=self.name, phase="db_write", host=""):
+                await save_stats(self.stats_table, self.label, player_count, server_count)
+                await save_server_history(self, self.cache)
+
+    def stats_history(self, start: Optional[int] = None, end: Optional[int] = None, points: Optional[int] = None) -> Dict[str, List[List[int]]]:
+        return get_stats_history(self.stats_table, self.label, start, end, points)
+
+class ElDewritoSource(Source):
+    name = "eldewrito"
+    label = "ElDewrito"
+    stats_table = "server_stats"
+    stats_index = "idx_recorded_at"
+    route_prefix = "/api"
+    list_path = "/api/"
+
+    def history_rows(self, data: Dict[str, Any]) -> List[tuple]:
+        return [(ip_port, _history_int(server.get("numPlayers")), server.get("map"), server.get("variantType") or server.get("variant"))
+                for ip_port, server in (data.get("servers") or {}).items()]
+
+    async def refresh(self):
+        """Main logic: Pulls master lists, dedupes, queries servers, updates cache."""
+        # 1. Load Master Server URLs from local JSON
+        try:
+            async with await anyio.open_file(ELDEWRITO_MASTER_LIST, 'r') as f:
+                data = await f.read()
+                config = json.loads(data)
+                master_entries = config.get("masterServers", [])
+                # Extract only the 'list' attribute
+                master_urls = [m['list'] for m in master_entries if 'list' in m]
+        except Exception as e:
+            logger.error(f"Error reading {ELDEWRITO_MASTER_LIST}: {e}")
+            return
+
+        client = get_http_client("eldewrito")
         # 2. Query all master servers concurrently
         logger.info(f"Querying {len(master_urls)} master servers...")
         master_tasks = [fetch_master_list(client, url) for url in master_urls]
@@ -910,55 +2328,87 @@ async def update_eldewrito_cache():
         for server_list in results:
             for ip_port in server_list:
                 unique_servers.add(ip_port)
-        
+            
         logger.info(f"Found {len(unique_servers)} unique game servers. Querying details...")
 
-        # 4. Query all game servers concurrently
-        # We limit concurrency slightly to avoid file descriptor limits if the list is huge,
-        # but for <100 servers, full concurrency is fine.
-        game_tasks = [fetch_game_server_info(client, srv) for srv in unique_servers]
+        # 4. Query all game servers through the probe scheduler, which caps concurrency
+        # globally and per host so large lists don't exhaust file descriptors.
+        # Each server is only probed when its registry schedule says it is due.
+        now = time.time()
+        probe_servers = [srv for srv in unique_servers if server_registry.is_due(self.name, srv, now)]
+        game_tasks = [eldewrito_probe_scheduler.run(srv.split(':')[0], fetch_game_server_info, client, srv) for srv in probe_servers]
         game_results = await asyncio.gather(*game_tasks)
 
         # 5. Build the final data structure
         successful_servers = {}
         total_players = 0
-        
-        for res in game_results:
-            if res:
-                ip_port, data = res
-                successful_servers[ip_port] = data
-                
-                # Safely add player count
-                if "numPlayers" in data:
-                    try:
-                        total_players += int(data["numPlayers"])
-                    except ValueError:
-                        pass
+            
+        with refresh_phase_seconds.time(source=self.name, phase="summarize", host=""):
+            for res in game_results:
+                if res:
+                    ip_port, data = res
+                    successful_servers[ip_port] = data
+                        
+                    # Safely add player count
+                    if "numPlayers" in data:
+                        try:
+                            total_players += int(data["numPlayers"])
+                        except ValueError:
+                            pass
+        probes_total.inc(len(successful_servers), source=self.name, result="ok")
+        probes_total.inc(len(probe_servers) - len(successful_servers), source=self.name, result="failed")
+
+        await server_registry.update(
+            self.name,
+            {ip_port: _history_int(data.get("numPlayers")) for ip_port, data in successful_servers.items()},
+            [srv for srv in probe_servers if srv not in successful_servers]
+        )
+        for ip_port, data in successful_servers.items():
+            data['firstSeenAt'] = formatdate(server_registry.first_seen(self.name, ip_port), usegmt=True)
+
+        # Servers that were not due this cycle keep the listing from their last answer
+        previous_servers = self.cache.get("servers") or {}
+        for ip_port in unique_servers.difference(probe_servers):
+            entry = server_registry.get(self.name, ip_port)
+            if ip_port in previous_servers and entry is not None and not entry.failures:
+                successful_servers[ip_port] = previous_servers[ip_port]
+                total_players += _history_int(previous_servers[ip_port].get("numPlayers"))
 
         # 6. Format Final JSON
-        new_cache = {
+        await self.publish({
             "count": {
                 "players": total_players,
                 "servers": len(successful_servers)
             },
             "updatedAt": get_current_http_date(),
             "servers": successful_servers
-        }
-
-        # Atomically update global cache
-        eldewrito_cache = new_cache
-        logger.info(f"ElDewrito Cache updated. Servers: {len(successful_servers)}, Players: {total_players}")
-
-async def update_cartographer_cache():
-    """Fetch Cartographer server list and update cache with summarized data."""
-    global cartographer_cache, cartographer_summarized_cache
-    
-    try:
-        async with httpx.AsyncClient(verify=False) as client:
+        })
+        logger.info(f"ElDewrito Cache updated. Servers: {len(successful_servers)}, Players: {total_players}, Probe concurrency: {eldewrito_probe_scheduler.limit}")
+        logger.debug(f"Reverse DNS cache: {rdns_cache.stats()}")
+        logger.debug(f"Mods cache: {mods_cache_stats['avoided']} requests avoided, {mods_cache_stats['fetched']} fetched")
+
+class CartographerSource(Source):
+    name = "cartographer"
+    label = "Cartographer"
+    stats_table = "cartographer_stats"
+    stats_index = "idx_cartographer_recorded_at"
+    route_prefix = "/api/cartographer"
+
+    def history_rows(self, data: Dict[str, Any]) -> List[tuple]:
+        return [(str(server["xuid"]), _history_int((server.get("players") or {}).get("filled")), server.get("map_name"), server.get("gametype"))
+                for server in data.get("servers") or [] if isinstance(server, dict) and server.get("xuid")]
+
+    async def refresh(self):
+        """Fetch Cartographer server list and update cache with summarized data."""
+        try:
+            client = get_http_client("cartographer")
             logger.info("Fetching Cartographer server list...")
-            response = await client.get(CARTOGRAPHER_LIST_URL, timeout=15.0)
-            response.raise_for_status()
-            data = response.json()
+            host = _url_host(CARTOGRAPHER_LIST_URL)
+            with refresh_phase_seconds.time(source=self.name, phase="master_fetch", host=host):
+                response = await client.get(CARTOGRAPHER_LIST_URL, timeout=15.0)
+                response.raise_for_status()
+            with refresh_phase_seconds.time(source=self.name, phase="master_decode", host=host):
+                data = response.json()
 
             if isinstance(data, list):
                 raw_list = data
@@ -970,32 +2420,51 @@ async def update_cartographer_cache():
             # Try to map servers directly first
             mapped = []
             ids = []
-            for item in raw_list:
-                if isinstance(item, dict) and (item.get('pProperties') or item.get('server_desc') or item.get('name')):
-                    mapped.append(summarize_server(item))
-                else:
-                    ids.append(item)
+            with refresh_phase_seconds.time(source=self.name, phase="summarize", host=""):
+                for item in raw_list:
+                    if isinstance(item, dict) and (item.get('pProperties') or item.get('server_desc') or item.get('name')):
+                        mapped.append(summarize_server(item))
+                    else:
+                        ids.append(item)
 
             # If we have already summarized data, use it
             if mapped:
                 logger.info(f"Using pre-summarized Cartographer data ({len(mapped)} servers)")
                 summarized_servers = mapped
+                seen = {str(server["xuid"]): _history_int((server.get("players") or {}).get("filled"))
+                        for server in mapped if isinstance(server, dict) and server.get("xuid")}
+                await server_registry.update(self.name, seen)
             else:
-                # Otherwise fetch each server detail concurrently
-                logger.info(f"Fetching details for {len(ids)} Cartographer servers...")
+                # Otherwise fetch the details of each server that is due, reusing the last summary for the rest
+                previous = {str(server.get('xuid')): server for server in self.cache.get('servers') or [] if isinstance(server, dict)}
+                now = time.time()
+                due = [sid for sid in ids if str(sid) not in previous or server_registry.is_due(self.name, str(sid), now)]
+                logger.info(f"Fetching details for {len(due)} of {len(ids)} Cartographer servers...")
                 sem = asyncio.Semaphore(CARTOGRAPHER_WORKERS)
-                
+                    
                 async def sem_fetch(sid):
                     async with sem:
-                        return await fetch_cartographer_server_details(client, sid)
-
-                tasks = [sem_fetch(sid) for sid in ids]
-                summarized_servers = await asyncio.gather(*tasks)
+                        try:
+                            return await fetch_cartographer_server_details(client, sid)
+                        except Exception as e:
+                            logger.warning(f"Failed to fetch Cartographer server {sid}: {e}")
+                            return None
+
+                tasks = [sem_fetch(sid) for sid in due]
+                fetched = dict(zip(map(str, due), await asyncio.gather(*tasks)))
+                # A failed fetch keeps the server's last summary, if it ever had one, and counts against it
+                summarized_servers = [fetched.get(str(sid)) or previous.get(str(sid)) for sid in ids]
+                summarized_servers = [server for server in summarized_servers if server is not None]
+                seen = {sid: _history_int((server.get("players") or {}).get("filled")) for sid, server in fetched.items() if server is not None}
+                failed = [sid for sid, server in fetched.items() if server is None]
+                probes_total.inc(len(seen), source=self.name, result="ok")
+                probes_total.inc(len(failed), source=self.name, result="failed")
+                await server_registry.update(self.name, seen, failed)
 
             # Calculate totals
             total_players = 0
             total_servers = len(summarized_servers)
-            
+                
             for server in summarized_servers:
                 if isinstance(server, dict):
                     players = server.get('players', {})
@@ -1005,128 +2474,129 @@ async def update_cartographer_cache():
                             total_players += int(filled)
                         except (ValueError, TypeError):
                             pass
-            
-            # Update both caches
-            cartographer_cache = {
-                "count": {
-                    "players": total_players,
-                    "servers": total_servers
-                },
-                "updatedAt": get_current_http_date(),
-                "servers": raw_list  # Keep raw list for compatibility
-            }
-
-            cartographer_summarized_cache = {
+                
+            await self.publish({
                 "count": {
                     "players": total_players,
                     "servers": total_servers
                 },
                 "updatedAt": get_current_http_date(),
                 "servers": summarized_servers  # Processed/summarized list
-            }
-            
+            })
+                
             logger.info(f"Cartographer Cache updated. Servers: {total_servers}, Players: {total_players}")
-            
-    except Exception as e:
-        logger.error(f"Failed to update Cartographer cache: {e}")
+                
+        except Exception as e:
+            logger.error(f"Failed to update Cartographer cache: {e}")
 
-async def update_haloce_cache():
-    """Fetch Halo CE server list and update cache with summarized data."""
-    global haloce_cache
-    
-    try:
-        logger.info("Fetching Halo CE server list from master server...")
-        
-        servers = await _resolve_gamespy_servers(['ce'], timeout=5.0)
-        
-        if not servers:
-            logger.warning("No Halo CE servers returned from master server")
-            return
-        
-        logger.info(f"Found {len(servers)} Halo CE servers. Querying for details...")
-        
-        responses = await _query_gamespy_server_info(servers, timeout=2.0)
+class GameSpySource(Source):
+    """A Halo game listed on the GameSpy master server and queried over UDP."""
 
-        server_list = []
-        total_players = 0
-        
-        if responses:
-            for resp in responses:
-                info = _parse_gamespy_server_info(resp.data) if isinstance(resp.data, str) else {}
-                
-                player_count = info.get('numplayers', 0)
-                if isinstance(player_count, int):
-                    total_players += player_count
-                
-                server_list.append({
-                    'address': resp.address,
-                    'port': resp.port,
-                    'game': resp.game,
-                    'info': info
-                })
-        
-        haloce_cache = {
-            "count": {
-                "players": total_players,
-                "servers": len(server_list)
-            },
-            "updatedAt": get_current_http_date(),
-            "servers": server_list
-        }
-        
-        logger.info(f"Halo CE cache updated. Servers: {len(server_list)}, Players: {total_players}")
-        
-    except Exception as e:
-        logger.error(f"Failed to update Halo CE cache: {e}")
+    gamespy_game: str = ""  # key for _resolve_gamespy_servers
+    master_host: str = GAMESPY_MASTER_HOST
+    master_port: int = GAMESPY_MASTER_PORT
 
-async def update_halopc_cache():
-    """Fetch Halo PC server list and update cache with summarized data."""
-    global halopc_cache
-    
-    try:
-        logger.info("Fetching Halo PC server list from master server...")
+    def history_rows(self, data: Dict[str, Any]) -> List[tuple]:
+        return [(server_key(server), _history_int(server["info"].get("numplayers")), server["info"].get("mapname"), server["info"].get("gametype"))
+                for server in data.get("servers") or []]
 
-        servers = await _resolve_gamespy_servers(['pc'], timeout=5.0)
-        
-        if not servers:
-            logger.warning("No Halo PC servers returned from master server")
-            return
-        
-        logger.info(f"Found {len(servers)} Halo PC servers. Querying for details...")
+    async def refresh(self):
+        """Fetch the GameSpy server list and update cache with summarized data."""
+        try:
+            logger.info(f"Resolving {self.label} server list...")
+            
+            servers = await _resolve_gamespy_servers([self.gamespy_game], self.master_host, self.master_port, timeout=5.0, source=self.name)
+            
+            if not servers:
+                logger.warning(f"No {self.label} servers known from master server")
+                return
+            
+            logger.info(f"Found {len(servers)} {self.label} servers. Querying for details...")
 
-        responses = await _query_gamespy_server_info(servers, timeout=2.0)
+            now = time.time()
+            probe_servers = [s for s in servers if server_registry.is_due(self.name, f"{s.address}:{s.port}", now)]
+            
+            responses = await _query_gamespy_server_info(probe_servers, timeout=2.0)
 
-        server_list = []
-        total_players = 0
-        
-        if responses:
-            for resp in responses:
-                info = _parse_gamespy_server_info(resp.data) if isinstance(resp.data, str) else {}
-                
-                player_count = info.get('numplayers', 0)
-                if isinstance(player_count, int):
-                    total_players += player_count
-                
-                server_list.append({
-                    'address': resp.address,
-                    'port': resp.port,
-                    'game': resp.game,
-                    'info': info
-                })
-
-        halopc_cache = {
-            "count": {
-                "players": total_players,
-                "servers": len(server_list)
-            },
-            "updatedAt": get_current_http_date(),
-            "servers": server_list
-        }
-        
-        logger.info(f"Halo PC cache updated. Servers: {len(server_list)}, Players: {total_players}")
-        
-    except Exception as e:
-        logger.error(f"Failed to update Halo PC cache: {e}")
+            server_list = []
+            total_players = 0
+            
+            if responses:
+                for resp in responses:
+                    if resp.rtt is not None:
+                        refresh_phase_seconds.observe(resp.rtt, source=self.name, phase="probe", host="")
+
+                with refresh_phase_seconds.time(source=self.name, phase="summarize", host=""):
+                    for resp in responses:
+                        info = _parse_gamespy_server_info(resp.data) if isinstance(resp.data, str) else {}
+                        
+                        player_count = info.get('numplayers', 0)
+                        if isinstance(player_count, int):
+                            total_players += player_count
+                        
+                        server_list.append({
+                            'address': resp.address,
+                            'port': resp.port,
+                            'game': resp.game,
+                            'ping': round(resp.rtt * 1000) if resp.rtt is not None else None,
+                            'info': info
+                        })
+            
+            answered = {server_key(server): _history_int(server['info'].get('numplayers')) for server in server_list}
+            probed = {f"{s.address}:{s.port}" for s in probe_servers}
+            probes_total.inc(len(answered), source=self.name, result="ok")
+            probes_total.inc(len(probed) - len(answered), source=self.name, result="failed")
+            await server_registry.update(self.name, answered, [key for key in probed if key not in answered])
+
+            # Servers that were not due this cycle keep the listing from their last answer
+            listed = {f"{s.address}:{s.port}" for s in servers}
+            for server in self.cache.get("servers") or []:
+                key = server_key(server)
+                entry = server_registry.get(self.name, key)
+                if key in listed and key not in probed and entry is not None and not entry.failures:
+                    server_list.append(server)
+                    total_players += _history_int(server['info'].get('numplayers'))
+
+            await self.publish({
+                "count": {
+                    "players": total_players,
+                    "servers": len(server_list)
+                },
+                "updatedAt": get_current_http_date(),
+                "servers": server_list
+            })
+            
+            logger.info(f"{self.label} cache updated. Servers: {len(server_list)}, Players: {total_players}")
+            
+        except Exception as e:
+            logger.error(f"Failed to update {self.label} cache: {e}")
+
+class HaloCESource(GameSpySource):
+    name = "haloce"
+    label = "Halo CE"
+    stats_table = "haloce_stats"
+    stats_index = "idx_halo_ce_recorded_at"
+    route_prefix = "/api/haloce"
+    gamespy_game = "ce"
+
+class HaloPCSource(GameSpySource):
+    name = "halopc"
+    label = "Halo PC"
+    stats_table = "halopc_stats"
+    stats_index = "idx_halo_pc_recorded_at"
+    route_prefix = "/api/halopc"
+    gamespy_game = "pc"
+
+sources: Dict[str, Source] = {}
+
+def register_source(source: Source) -> Source:
+    sources[source.name] = source
+    return source
+
+register_source(ElDewritoSource())
+register_source(CartographerSource())
+register_source(HaloCESource())
+register_source(HaloPCSource())
 
 # --- Helper Functions ---
 
@@ -1134,22 +2604,44 @@ def get_current_http_date() -> str:
     """Returns the current date in HTTP format (RFC 1123)."""
     return formatdate(timeval=None, localtime=False, usegmt=True)
 
+rdns_cache = TTLCache(RDNS_CACHE_SIZE, name="rdns")
+rdns_executor = CountingThreadPoolExecutor(max_workers=RDNS_WORKERS, thread_name_prefix="rdns")
+rdns_pending: Dict[str, asyncio.Task] = {}
+
 async def resolve_reverse_dns(ip: str) -> Optional[str]:
-    """Resolves IP to hostname asynchronously without blocking the loop."""
+    """Resolves IP to hostname on the dedicated rDNS pool, caching hits and misses."""
     loop = asyncio.get_running_loop()
     try:
-        # run_in_executor allows blocking socket calls to run in a thread
-        host_info = await loop.run_in_executor(None, socket.gethostbyaddr, ip)
+        # gethostbyaddr blocks, so it runs on its own small pool instead of the default executor
+        with refresh_phase_seconds.time(source="eldewrito", phase="rdns", host=""):
+            host_info = await loop.run_in_executor(rdns_executor, socket.gethostbyaddr, ip)
+        rdns_cache.set(ip, host_info[0], RDNS_TTL)
         return host_info[0]
     except Exception:
+        rdns_cache.set(ip, None, RDNS_NEGATIVE_TTL)
         return None
 
+def cached_reverse_dns(ip: str) -> Optional[str]:
+    """Returns the cached hostname for IP, scheduling a background lookup when it is missing or expired."""
+    hostname, fresh = rdns_cache.get_stale(ip)
+    if fresh:
+        return hostname
+    if ip not in rdns_pending:
+        task = asyncio.create_task(resolve_reverse_dns(ip))
+        rdns_pending[ip] = task
+        task.add_done_callback(lambda _: rdns_pending.pop(ip, None))
+    # An expired name keeps being served until the lookup replaces it, so it does not blink out of the listing
+    return None if hostname is _MISSING else hostname
+
 async def fetch_master_list(client: httpx.AsyncClient, url: str) -> List[str]:
     """Queries a single master server and returns a list of IP:Port strings."""
+    host = _url_host(url)
     try:
-        response = await client.get(url, timeout=API_TIMEOUT)
-        response.raise_for_status()
-        data = response.json()
+        with refresh_phase_seconds.time(source="eldewrito", phase="master_fetch", host=host):
+            response = await client.get(url, timeout=API_TIMEOUT)
+            response.raise_for_status()
+        with refresh_phase_seconds.time(source="eldewrito", phase="master_decode", host=host):
+            data = response.json()
         
         # Check structure: {"result": {"servers": [...]}}
         if "result" in data and "servers" in data["result"]:
@@ -1162,39 +2654,58 @@ async def fetch_server_mods(client: httpx.AsyncClient, ip_port: str) -> Optional
     """Queries a specific game server's /mods endpoint and returns mod data."""
     try:
         url = f"http://{ip_port}/mods"
-        response = await client.get(url, timeout=API_TIMEOUT)
-        response.raise_for_status()
-        mods_data = response.json()
+        with refresh_phase_seconds.time(source="eldewrito", phase="mods", host=""):
+            response = await client.get(url, timeout=API_TIMEOUT)
+            response.raise_for_status()
+            mods_data = response.json()
         return mods_data
     except Exception as e:
         # Server might not have mods endpoint or it's unreachable
         logger.debug(f"Failed to fetch mods from {ip_port}: {e}")
         return None
 
+mods_cache = TTLCache(MODS_CACHE_SIZE, name="mods")
+mods_cache_stats = {"fetched": 0, "avoided": 0}
+
+async def fetch_server_mods_cached(client: httpx.AsyncClient, ip_port: str, server_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Returns a server's mods, only refetching when its status fingerprint changes or the entry expires."""
+    fingerprint = tuple(server_data.get(key) for key in MODS_FINGERPRINT_KEYS)
+    uptime = server_data.get('uptime')
+    entry = mods_cache.get(ip_port)
+    if entry is not _MISSING and entry[0] == fingerprint:
+        # A lower uptime than last time means the server restarted and may have changed mods
+        restarted = isinstance(uptime, (int, float)) and isinstance(entry[1], (int, float)) and uptime < entry[1]
+        if not restarted:
+            entry[1] = uptime
+            mods_cache_stats["avoided"] += 1
+            return entry[2]
+
+    mods_data = await fetch_server_mods(client, ip_port)
+    mods_cache_stats["fetched"] += 1
+    mods_cache.set(ip_port, [fingerprint, uptime, mods_data], MODS_TTL if mods_data else MODS_FAILURE_TTL)
+    return mods_data
+
 async def fetch_game_server_info(client: httpx.AsyncClient, ip_port: str) -> Optional[Dict[str, Any]]:
     """Queries a specific game server and formats the data."""
     try:
         # Assume HTTP protocol for the query based on the prompt
         url = f"http://{ip_port}/"
-        response = await client.get(url, timeout=API_TIMEOUT)
-        response.raise_for_status()
-        server_data = response.json()
+        with refresh_phase_seconds.time(source="eldewrito", phase="probe", host=""):
+            response = await client.get(url, timeout=API_TIMEOUT)
+            response.raise_for_status()
+            server_data = response.json()
         
         # We need to extract the IP from the string "127.0.0.1:8080"
         ip_address = ip_port.split(':')[0]
         
-        # Attempt Reverse DNS (optional, but present in requested output)
-        # We run this concurrently with the data processing to save time? 
-        # Actually, let's just do it here.
-        rdns = await resolve_reverse_dns(ip_address)
+        # Reverse DNS comes from the cache; misses are resolved in the background
+        # and show up on a later refresh instead of holding up this probe.
+        rdns = cached_reverse_dns(ip_address)
         
         if rdns:
             server_data['reverseDns'] = rdns
-            
-        # Add 'firstSeenAt' - In a real DB app this is persistent, 
-        # but for a memory-cache script, we'll set it to now or keep it if we had persistence.
-        # For this logic, we just set it to current refresh time to match schema validity.
-        server_data['firstSeenAt'] = get_current_http_date()
+
+        # 'firstSeenAt' is filled in from the server registry once the whole cycle is known
 
         # Generate short version if not present
         version_short = None
@@ -1204,7 +2715,7 @@ async def fetch_game_server_info(client: httpx.AsyncClient, ip_port: str) -> Opt
 
         # Fetch mods data (Will need to update this if we ever get to 0.8)
         if version_short and version_short.startswith("0.7"):
-            mods_data = await fetch_server_mods(client, ip_port)
+            mods_data = await fetch_server_mods_cached(client, ip_port, server_data)
             if mods_data:
                 server_data['mods'] = mods_data
 
@@ -1214,121 +2725,134 @@ async def fetch_game_server_info(client: httpx.AsyncClient, ip_port: str) -> Opt
         logger.debug(f"Failed to fetch server info from {ip_port}: {e}")
         return None
 
-# --- Background Task Loops ---
+# --- Background Task Scheduling ---
 
-async def background_eldewrito_refresher():
-    """Runs the update logic every X seconds."""
-    while True:
-        start_time = datetime.now()
-        await update_eldewrito_cache()
-        elapsed = (datetime.now() - start_time).total_seconds()
-        
-        sleep_time = max(0, REFRESH_INTERVAL - elapsed)
-        await asyncio.sleep(sleep_time)
+class SourceScheduler:
+    """Runs every source's refresh and stats jobs, restarting a job if it crashes.
 
-async def background_cartographer_refresher():
-    """Runs the Cartographer update logic every X seconds."""
-    while True:
-        start_time = datetime.now()
-        await update_cartographer_cache()
-        elapsed = (datetime.now() - start_time).total_seconds()
-        
-        sleep_time = max(0, REFRESH_INTERVAL - elapsed)
-        await asyncio.sleep(sleep_time)
+    Sources are staggered across their interval so they don't all hit the CPU and network on the
+    same tick; stop() cancels every job and waits for it to finish.
+    """
 
-async def background_haloce_refresher():
-    """Runs the Halo CE update logic every X seconds."""
-    while True:
-        start_time = datetime.now()
-        await update_haloce_cache()
-        elapsed = (datetime.now() - start_time).total_seconds()
-        
-        sleep_time = max(0, REFRESH_INTERVAL - elapsed)
-        await asyncio.sleep(sleep_time)
-
-async def background_halopc_refresher():
-    """Runs the Halo PC update logic every X seconds."""
-    while True:
-        start_time = datetime.now()
-        await update_halopc_cache()
-        elapsed = (datetime.now() - start_time).total_seconds()
-        
-        sleep_time = max(0, REFRESH_INTERVAL - elapsed)
-        await asyncio.sleep(sleep_time)
-
-async def background_eldewrito_stats_recorder():
-    """Records ElDewrito stats to database every 5 minutes."""
-    while True:
-        await asyncio.sleep(STATS_INTERVAL)
-        
-        if eldewrito_cache and "count" in eldewrito_cache:
-            player_count = eldewrito_cache["count"].get("players", 0)
-            server_count = eldewrito_cache["count"].get("servers", 0)
-            save_eldewrito_stats(player_count, server_count)
+    def __init__(self):
+        self.tasks: List[asyncio.Task] = []
+
+    def start(self, sources: Iterable[Source]):
+        sources = list(sources)
+        for i, source in enumerate(sources):
+            share = i / len(sources)
+            self.spawn(f"{source.label} refresh", source.run_refresh, source.refresh_interval, share * source.refresh_interval)
+            # Stats are first recorded one interval after startup, once the caches are warm
+            self.spawn(f"{source.label} stats", source.record_stats, source.stats_interval, (1 + share) * source.stats_interval)
+
+    def spawn(self, name: str, job: Callable[[], Awaitable[Any]], interval: float, delay: float = 0.0):
+        """Run job every interval seconds (after an initial delay) under supervision until stop()."""
+        self.tasks.append(asyncio.create_task(self._supervise(name, job, interval, delay)))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+
+    @staticmethod
+    async def _run(job: Callable[[], Awaitable[Any]], interval: float, delay: float):
+        await asyncio.sleep(delay)
+        while True:
+            started = time.monotonic()
+            await job()
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(0, interval - elapsed))
 
-async def background_cartographer_stats_recorder():
-    """Records Cartographer stats to database every 5 minutes."""
-    while True:
-        await asyncio.sleep(STATS_INTERVAL)
-        
-        if cartographer_cache and "count" in cartographer_cache:
-            player_count = cartographer_cache["count"].get("players", 0)
-            server_count = cartographer_cache["count"].get("servers", 0)
-            save_cartographer_stats(player_count, server_count)
+    async def _supervise(self, name: str, job: Callable[[], Awaitable[Any]], interval: float, delay: float):
+        restarts = 0
+        while True:
+            started = time.monotonic()
+            try:
+                await self._run(job, interval, delay)
+            except Exception:
+                # A job that ran for a while before crashing starts over with a short backoff
+                restarts = 1 if time.monotonic() - started > SCHEDULER_RESTART_MAX else restarts + 1
+                delay = min(2 ** restarts, SCHEDULER_RESTART_MAX)
+                logger.exception(f"{name} crashed, restarting in {delay}s")
 
-async def background_haloce_stats_recorder():
-    """Records Halo CE stats to database every 5 minutes."""
-    while True:
-        await asyncio.sleep(STATS_INTERVAL)
-        
-        if haloce_cache and "count" in haloce_cache:
-            player_count = haloce_cache["count"].get("players", 0)
-            server_count = haloce_cache["count"].get("servers", 0)
-            save_haloce_stats(player_count, server_count)
+source_scheduler = SourceScheduler()
 
-async def background_halopc_stats_recorder():
-    """Records Halo PC stats to database every 5 minutes."""
-    while True:
-        await asyncio.sleep(STATS_INTERVAL)
-        
-        if halopc_cache and "count" in halopc_cache:
-            player_count = halopc_cache["count"].get("players", 0)
-            server_count = halopc_cache["count"].get("servers", 0)
-            save_halopc_stats(player_count, server_count)
+async def measure_event_loop_lag():
+    loop = asyncio.get_running_loop()
+    expected = loop.time() + LOOP_LAG_INTERVAL
+    await asyncio.sleep(LOOP_LAG_INTERVAL)
+    event_loop_lag_seconds.set(max(0.0, loop.time() - expected))
 
 # --- FastAPI Events & Routes ---
 
 @app.on_event("startup")
 async def startup_event():
+    # asyncio.to_thread and getaddrinfo share the default executor
+    asyncio.get_running_loop().set_default_executor(CountingThreadPoolExecutor())
+    open_http_clients()
     await init_db()
+    await server_registry.load()
+    for source in sources.values():
+        await load_stats_series(source.stats_table, source.label)
 
-    # TODO: This could probably be handled a lot better (these async tasks have no kill condition)
-    asyncio.create_task(background_eldewrito_refresher())
-    asyncio.create_task(background_cartographer_refresher())
-    asyncio.create_task(background_haloce_refresher())
-    asyncio.create_task(background_halopc_refresher())
-    asyncio.create_task(background_eldewrito_stats_recorder())
-    asyncio.create_task(background_cartographer_stats_recorder())
-    asyncio.create_task(background_haloce_stats_recorder())
-    asyncio.create_task(background_halopc_stats_recorder())
+    source_scheduler.start(sources.values())
+    source_scheduler.spawn("Event loop lag", measure_event_loop_lag, 0)
+    close_streams_on_exit_signals()
 
-# --- ElDewrito FastAPI Routes ---
+@app.on_event("shutdown")
+async def shutdown_event():
+    await source_scheduler.stop()
+    await close_http_clients()
+    rdns_executor.shutdown(wait=False, cancel_futures=True)
+    close_streams()
+    await asyncio.to_thread(db.close)
 
-@app.get("/api/")
-async def get_eldewrito_servers():
-    """Serve the current cached ElDewrito server data."""
-    if not eldewrito_cache:
-        return JSONResponse(
-            status_code=503, 
-            content={"error": "ElDewrito data is warming up, please try again in a few seconds."}
-        )
-    return eldewrito_cache
+# --- Source FastAPI Routes ---
+
+def add_source_routes(source: Source):
+    """Register the list, stream, stats and per-server history endpoints of a source."""
 
-@app.get("/api/stats")
-async def get_eldewrito_historical_stats():
-    """Serve historical ElDewrito stats data for charting."""
-    stats = get_eldewrito_stats_history()
-    return stats
+    async def get_servers(request: Request, since: Optional[str] = None):
+        if source.name not in snapshots:
+            return JSONResponse(
+                status_code=503,
+                content={"error": f"{source.label} data is warming up, please try again in a few seconds."}
+            )
+        return snapshot_response(request, source.name, since)
+
+    async def get_stream(request: Request):
+        return stream_response(request, source.name)
+
+    async def get_historical_stats(
+        start: Optional[int] = Query(None, alias="from", description="Start of the range, ms since epoch"),
+        end: Optional[int] = Query(None, alias="to", description="End of the range, ms since epoch"),
+        points: Optional[int] = Query(None, ge=3, le=STATS_MAX_POINTS, description="Downsample each series to this many points"),
+    ):
+        return source.stats_history(start, end, points)
+
+    async def get_server_history(
+        server_id: str,
+        start: Optional[int] = Query(None, alias="from", description="Start of the range, ms since epoch"),
+        end: Optional[int] = Query(None, alias="to", description="End of the range, ms since epoch"),
+        points: Optional[int] = Query(None, ge=3, le=STATS_MAX_POINTS, description="Downsample the player series to this many points"),
+    ):
+        return await server_history_response(source.name, server_id, start, end, points)
+
+    prefix = source.route_prefix
+    app.add_api_route(source.list_path or prefix, get_servers, methods=["GET"], name=f"get_{source.name}_servers",
+                      description=f"Serve the current cached {source.label} server data, or the changes since ?since=<version>.")
+    app.add_api_route(f"{prefix}/stream", get_stream, methods=["GET"], name=f"get_{source.name}_stream",
+                      description=f"Stream {source.label} server updates as Server-Sent Events: a snapshot on connect, then patches.")
+    app.add_api_route(f"{prefix}/stats", get_historical_stats, methods=["GET"], name=f"get_{source.name}_historical_stats",
+                      description=f"Serve historical {source.label} stats data for charting.")
+    app.add_api_route(f"{prefix}/server/{{server_id}}/history", get_server_history, methods=["GET"], name=f"get_{source.name}_server_history",
+                      description=f"Serve the recorded population history of one {source.label} server.")
+
+for source in sources.values():
+    add_source_routes(source)
+
+# --- ElDewrito FastAPI Routes ---
 
 @app.get("/api/servicerecord")
 async def get_eldewrito_service_record(uid: Optional[str] = None):
@@ -1337,77 +2861,72 @@ async def get_eldewrito_service_record(uid: Optional[str] = None):
         if not uid:
             return JSONResponse(status_code=400, content={"error": "Missing or invalid uid"})
 
-        async with httpx.AsyncClient() as client:
-            headers = {"Content-Type": "application/json", "User-Agent": "ElDewrito/0.7.1"}
-            resp = await client.post("https://api.eldewrito.org/api/servicerecord", json={"uid": uid}, headers=headers, timeout=API_TIMEOUT)
+        client = get_http_client("eldewrito_api")
+        headers = {"Content-Type": "application/json", "User-Agent": "ElDewrito/0.7.1"}
+        resp = await client.post("https://api.eldewrito.org/api/servicerecord", json={"uid": uid}, headers=headers, timeout=API_TIMEOUT)
 
-            try:
-                content = resp.json()
-            except Exception:
-                content = resp.text
+        try:
+            content = resp.json()
+        except Exception:
+            content = resp.text
 
-            try:
-                player_id = None
-                if isinstance(content, dict):
-                    id_val = content.get('id')
-                    if not id_val and isinstance(content.get('player'), dict):
-                        id_val = content['player'].get('id')
-
-                    if id_val is not None and (isinstance(id_val, int) or (isinstance(id_val, str) and str(id_val).isdigit())):
-                        player_id = str(id_val)
-
-                if player_id:
-                    stats_url = f"https://stats.eldewrito.org/player/{player_id}"
-                    try:
-                        stats_resp = await client.get(stats_url, timeout=API_TIMEOUT)
-                        if stats_resp.status_code == 200 and stats_resp.text:
-                            m = re.search(r"<span[^>]*class=[\"']playerRank[\"'][^>]*>\s*Rank:\s*(\d+)", stats_resp.text, re.IGNORECASE)
-                            if m:
-                                rank_val = int(m.group(1))
-                                if isinstance(content, dict):
-                                    content['rank'] = rank_val
-                                else:
-                                    content = {"raw": content, "rank": rank_val}
-                    except Exception:
-                        logger.debug("Failed to fetch or parse stats page for player id %s", player_id)
-            except Exception:
-                logger.debug("Error while attempting to enrich service record with player rank", exc_info=True)
+        try:
+            player_id = None
+            if isinstance(content, dict):
+                id_val = content.get('id')
+                if not id_val and isinstance(content.get('player'), dict):
+                    id_val = content['player'].get('id')
+
+                if id_val is not None and (isinstance(id_val, int) or (isinstance(id_val, str) and str(id_val).isdigit())):
+                    player_id = str(id_val)
+
+            if player_id:
+                stats_url = f"https://stats.eldewrito.org/player/{player_id}"
+                try:
+                    stats_resp = await client.get(stats_url, timeout=API_TIMEOUT)
+                    if stats_resp.status_code == 200 and stats_resp.text:
+                        m = re.search(r"<span[^>]*class=[\"']playerRank[\"'][^>]*>\s*Rank:\s*(\d+)", stats_resp.text, re.IGNORECASE)
+                        if m:
+                            rank_val = int(m.group(1))
+                            if isinstance(content, dict):
+                                content['rank'] = rank_val
+                            else:
+                                content = {"raw": content, "rank": rank_val}
+                except Exception:
+                    logger.debug("Failed to fetch or parse stats page for player id %s", player_id)
+        except Exception:
+            logger.debug("Error while attempting to enrich service record with player rank", exc_info=True)
 
-            return JSONResponse(status_code=resp.status_code, content=content)
+        return JSONResponse(status_code=resp.status_code, content=content)
     except Exception as e:
         logger.exception("Error proxying GET service record request")
         return JSONResponse(status_code=503, content={"error": "Failed to fetch service record", "message": str(e)})
 
 # --- Cartographer FastAPI Routes ---
 
-@app.get("/api/cartographer")
-async def get_cartographer_servers():
-    """Serve the current Cartographer server list (summarized)."""
-    if not cartographer_summarized_cache:
-        return JSONResponse(
-            status_code=503,
-            content={"error": "Cartographer data is warming up, please try again in a few seconds."}
-        )
-    return cartographer_summarized_cache
-
-@app.get("/api/cartographer/stats")
-async def get_cartographer_historical_stats():
-    """Serve historical Cartographer stats data for charting."""
-    stats = get_cartographer_stats_history()
-    return stats
-
 @app.get("/api/cartographer/server/{server_id}")
 async def get_cartographer_server_detail(server_id: str):
     """Fetch and return details for a specific Cartographer server."""
     try:
-        async with httpx.AsyncClient(verify=False) as client:
-            server_data = await fetch_cartographer_server_details(client, server_id)
-            if server_data:
-                return server_data
+        client = get_http_client("cartographer")
+        server_data = await fetch_cartographer_server_details(client, server_id)
+        if server_data:
+            return server_data
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Server not found"}
+        )
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
             return JSONResponse(
                 status_code=404,
                 content={"error": "Server not found"}
             )
+        logger.error(f"Cartographer returned {e.response.status_code} for server {server_id}")
+        return JSONResponse(
+            status_code=502,
+            content={"error": "Failed to fetch server details", "message": f"Upstream returned {e.response.status_code}"}
+        )
     except Exception as e:
         logger.error(f"Failed to fetch Cartographer server {server_id}: {e}")
         return JSONResponse(
@@ -1415,41 +2934,12 @@ async def get_cartographer_server_detail(server_id: str):
             content={"error": "Failed to fetch server details", "message": str(e)}
         )
 
-# --- Halo CE FastAPI Routes ---
-
-@app.get("/api/haloce")
-async def get_haloce_servers():
-    """Serve the current cached Halo CE server data."""
-    if not haloce_cache:
-        return JSONResponse(
-            status_code=503, 
-            content={"error": "Halo CE data is warming up, please try again in a few seconds."}
-        )
-    return haloce_cache
-
-@app.get("/api/haloce/stats")
-async def get_haloce_historical_stats():
-    """Serve historical Halo CE stats data for charting."""
-    stats = get_haloce_stats_history()
-    return stats
-
-# --- Halo PC FastAPI Routes ---
-
-@app.get("/api/halopc")
-async def get_haloce_servers():
-    """Serve the current cached Halo PC server data."""
-    if not halopc_cache:
-        return JSONResponse(
-            status_code=503, 
-            content={"error": "Halo CE data is warming up, please try again in a few seconds."}
-        )
-    return halopc_cache
+# --- Metrics Route ---
 
-@app.get("/api/halopc/stats")
-async def get_haloce_historical_stats():
-    """Serve historical Halo PC stats data for charting."""
-    stats = get_halopc_stats_history()
-    return stats
+@app.get("/metrics")
+async def get_metrics():
+    """Expose refresh timings, counters and gauges in the Prometheus text format."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # --- Entry Point ---
 